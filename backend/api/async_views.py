@@ -0,0 +1,251 @@
+import asyncio
+import math
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Prefetch, prefetch_related_objects
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import (APIException, NotAuthenticated,
+                                       NotFound, ValidationError)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import in_memory_search
+from users.models import User
+from users.subscriptions import prime_followed_author_ids
+
+from .counts import get_count
+from .fast_serializers import FastRecipeSerializer
+from .filters import IngredientFilter, RecipeFilter
+from .paginations import CustomPaginator
+from .renderers import ORJSONRenderer
+from .serializers import (IngredientSerializer, RecipeSerializer,
+                          SubscriptionSerializer, TagSerializer)
+from .utils import get_recipes_limit
+from .views import RecipeViewSet
+
+SYNC_PARAMS = ('cursor', 'pagination', 'format')
+
+
+def call(func, args, kwargs):
+    # Соединения с БД в потоках пула живут как в обычном запросе:
+    # с учетом CONN_MAX_AGE и с проверкой перед использованием.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет синхронную функцию с ORM в отдельном потоке.
+
+    Каждый поток использует свое соединение с БД, поэтому несколько
+    вызовов, объединенных через `asyncio.gather`, выполняются параллельно.
+    Соединения должны быть постоянными (проверка api.E001), иначе каждый
+    вызов открывал бы новое соединение.
+    """
+    return await sync_to_async(call, thread_sensitive=False)(
+        func, args, kwargs
+    )
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    renderer = ORJSONRenderer()
+    return HttpResponse(
+        renderer.render(data),
+        status=status_code,
+        content_type=renderer.media_type
+    )
+
+
+def authenticate(request):
+    """DRF Request с пользователем, определенным по токену."""
+    request = Request(request, authenticators=[
+        authenticator() for authenticator
+        in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ])
+    request.user
+    return request
+
+
+def api_view(func):
+    """Асинхронное представление с аутентификацией DRF и ответом в JSON."""
+    async def view(request, *args, **kwargs):
+        try:
+            request = await run(authenticate, request)
+            return render(await func(request, *args, **kwargs))
+        except APIException as exc:
+            data = (
+                exc.detail if isinstance(exc.detail, (list, dict))
+                else {'detail': exc.detail}
+            )
+            return render(data, exc.status_code)
+    return view
+
+
+def read_view(async_view, sync_view):
+    """GET обслуживает асинхронное представление, остальное - вьюсет.
+
+    Курсорная пагинация и выбор формата (`format`) тоже остаются
+    за синхронным вьюсетом.
+    """
+    call_sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        use_sync = request.method != 'GET' or any(
+            param in request.GET for param in SYNC_PARAMS
+        )
+        if use_sync:
+            return await call_sync_view(request, *args, **kwargs)
+        return await async_view(request, *args, **kwargs)
+    view.csrf_exempt = True
+    # Имя эндпоинта для замеров и бюджетов (api.middleware.get_endpoint).
+    view.sync_view = sync_view
+    return view
+
+
+def filter_queryset(filterset_class, request, queryset):
+    filterset = filterset_class(
+        request.query_params, queryset=queryset, request=request
+    )
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    return filterset.qs
+
+
+async def paginate(request, queryset, view):
+    """Страница списка: количество и строки запрашиваются параллельно."""
+    paginator = CustomPaginator()
+    page_size = paginator.get_page_size(request)
+    try:
+        number = int(request.query_params.get(paginator.page_query_param, 1))
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise NotFound(paginator.invalid_page_message)
+    offset = (number - 1) * page_size
+    count, rows = await asyncio.gather(
+        run(get_count, queryset, request, view),
+        run(list, queryset[offset:offset + page_size]),
+    )
+    num_pages = max(math.ceil(count / page_size), 1)
+    if number > num_pages:
+        raise NotFound(paginator.invalid_page_message)
+    url = request.build_absolute_uri()
+    previous = None
+    if number == 2:
+        previous = remove_query_param(url, paginator.page_query_param)
+    elif number > 2:
+        previous = replace_query_param(
+            url, paginator.page_query_param, number - 1
+        )
+    return rows, {
+        'count': count,
+        'next': replace_query_param(
+            url, paginator.page_query_param, number + 1
+        ) if number < num_pages else None,
+        'previous': previous,
+    }
+
+
+async def prefetch_recipes(recipes):
+    """Теги и ингредиенты рецептов загружаются параллельно."""
+    await asyncio.gather(
+        run(prefetch_related_objects, recipes, 'tags'),
+        run(prefetch_related_objects, recipes, Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        )),
+    )
+
+
+RECIPE_LIST_VIEW = SimpleNamespace(
+    action='list', user_filter_params=RecipeViewSet.user_filter_params
+)
+
+
+@api_view
+async def recipe_list(request):
+    queryset = await run(
+        filter_queryset, RecipeFilter, request,
+        Recipe.objects.select_related('author')
+    )
+    (recipes, page), _ = await asyncio.gather(
+        paginate(
+            request, queryset.with_user_flags(request.user), RECIPE_LIST_VIEW
+        ),
+        run(prime_followed_author_ids, request),
+    )
+    await prefetch_recipes(recipes)
+    serializer_class = (
+        FastRecipeSerializer if settings.FAST_SERIALIZERS
+        else RecipeSerializer
+    )
+    return {**page, 'results': serializer_class(
+        recipes, many=True, context={'request': request}
+    ).data}
+
+
+@api_view
+async def recipe_detail(request, pk):
+    recipes, _ = await asyncio.gather(
+        run(list, Recipe.objects.select_related('author').with_user_flags(
+            request.user
+        ).filter(pk=pk)),
+        run(prime_followed_author_ids, request),
+    )
+    if not recipes:
+        raise NotFound()
+    await prefetch_recipes(recipes)
+    return RecipeSerializer(recipes[0], context={'request': request}).data
+
+
+@api_view
+async def tag_list(request):
+    tags = await run(list, Tag.objects.all())
+    return TagSerializer(tags, many=True).data
+
+
+@api_view
+async def ingredient_list(request):
+    name = request.query_params.get('name')
+    if settings.INGREDIENT_AUTOCOMPLETE and name:
+        return await run(in_memory_search.autocomplete, name)
+    queryset = await run(
+        filter_queryset, IngredientFilter, request, Ingredient.objects.all()
+    )
+    return await run(list, queryset.values(*IngredientSerializer.Meta.fields))
+
+
+@api_view
+async def subscriptions(request):
+    if not request.user.is_authenticated:
+        raise NotAuthenticated()
+    authors, page = await paginate(
+        request,
+        User.objects.filter(
+            subscribing__user=request.user
+        ).annotate(
+            recipes_count=Count('recipes')
+        ).order_by('username'),
+        SimpleNamespace(action='subscriptions')
+    )
+    recipes = Recipe.objects.all()
+    recipes_limit = get_recipes_limit(request)
+    if recipes_limit is not None:
+        recipes = recipes.latest_per_author(
+            [author.pk for author in authors], recipes_limit
+        )
+    await run(
+        prefetch_related_objects, authors,
+        Prefetch('recipes', queryset=recipes, to_attr='recipes_preview')
+    )
+    return {**page, 'results': SubscriptionSerializer(
+        authors, many=True, context={'request': request}
+    ).data}
@@ -0,0 +1,17 @@
+from django.core.cache import cache
+
+
+def generation_key(model):
+    return f'generation:{model._meta.label_lower}'
+
+
+def get_generation(model):
+    """Номер поколения данных модели, меняется при каждой записи."""
+    return cache.get_or_set(generation_key(model), 1, None)
+
+
+def bump_generation(model):
+    try:
+        cache.incr(generation_key(model))
+    except ValueError:
+        cache.set(generation_key(model), 1, None)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_async_read_views(app_configs, **kwargs):
+    """Асинхронным представлениям нужны постоянные соединения с БД.
+
+    При CONN_MAX_AGE=0 каждый вызов `async_views.run` открывал бы
+    и закрывал соединение, что дороже выигрыша от параллельных запросов.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return []
+    return [
+        Error(
+            f'ASYNC_READ_VIEWS requires persistent connections to the '
+            f'"{alias}" database.',
+            hint='Set CONN_MAX_AGE to a positive number of seconds or None.',
+            id='api.E001',
+        )
+        for alias, database in settings.DATABASES.items()
+        if database.get('CONN_MAX_AGE', 0) == 0
+    ]
@@ -0,0 +1,68 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .caching import get_generation
+
+IGNORED_PARAMS = frozenset(
+    ('page', 'limit', 'cursor', 'pagination', 'format', 'ordering')
+)
+
+
+def get_filter_params(request):
+    return sorted(
+        (key, sorted(values))
+        for key, values in request.query_params.lists()
+        if key not in IGNORED_PARAMS
+    )
+
+
+def get_count_cache_key(request, view, model):
+    """Ключ кэша количества объектов для нормализованного набора фильтров.
+
+    Возвращает None, если количество зависит от пользователя.
+    """
+    if getattr(view, 'action', None) != 'list':
+        return None
+    params = get_filter_params(request)
+    user_params = getattr(view, 'user_filter_params', ())
+    if any(key in user_params for key, _ in params):
+        return None
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return (
+        f'count:{model._meta.label_lower}:{get_generation(model)}:{digest}'
+    )
+
+
+def estimate_count(model):
+    """Оценка числа строк таблицы по статистике PostgreSQL."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            (model._meta.db_table,)
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] <= 0:
+        return None
+    return row[0]
+
+
+def get_count(queryset, request, view):
+    """Количество объектов: из кэша, по оценке или через COUNT(*)."""
+    model = queryset.model
+    key = get_count_cache_key(request, view, model)
+    if key is None:
+        return queryset.count()
+    count = cache.get(key)
+    if count is not None:
+        return count
+    if settings.COUNT_ESTIMATE and not get_filter_params(request):
+        count = estimate_count(model)
+    if count is None:
+        count = queryset.count()
+    cache.set(key, count, settings.COUNT_CACHE_TIMEOUT)
+    return count
@@ -0,0 +1,121 @@
+from operator import attrgetter
+
+from users.subscriptions import is_subscribed
+
+from .utils import get_image_variants
+
+
+class FastSerializer:
+    """Сериализатор только для чтения по заранее собранному плану полей.
+
+    План - кортеж пар (ключ, функция(obj, serializer)), который строится
+    один раз при объявлении класса. Вывод совпадает с соответствующим
+    ModelSerializer, но без создания полей DRF на каждый объект.
+    """
+
+    plan = ()
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.request = self.context.get('request')
+
+    def to_representation(self, obj):
+        return {key: getter(obj, self) for key, getter in self.plan}
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(obj) for obj in self.instance]
+        return self.to_representation(self.instance)
+
+
+def attribute(name):
+    getter = attrgetter(name)
+    return lambda obj, serializer: getter(obj)
+
+
+def nested(plan, source):
+    getter = attrgetter(source)
+
+    def represent(obj, serializer):
+        return {key: get(getter(obj), serializer) for key, get in plan}
+    return represent
+
+
+def nested_many(plan, source):
+    getter = attrgetter(source)
+
+    def represent(obj, serializer):
+        return [
+            {key: get(item, serializer) for key, get in plan}
+            for item in getter(obj).all()
+        ]
+    return represent
+
+
+def image_url(name):
+    getter = attrgetter(name)
+
+    def represent(obj, serializer):
+        image = getter(obj)
+        if not image:
+            return None
+        url = image.url
+        if serializer.request is None:
+            return url
+        return serializer.request.build_absolute_uri(url)
+    return represent
+
+
+USER_PLAN = (
+    ('email', attribute('email')),
+    ('id', attribute('id')),
+    ('username', attribute('username')),
+    ('first_name', attribute('first_name')),
+    ('last_name', attribute('last_name')),
+    ('is_subscribed', lambda obj, serializer: is_subscribed(
+        serializer.request, obj
+    )),
+)
+
+TAG_PLAN = (
+    ('id', attribute('id')),
+    ('name', attribute('name')),
+    ('color', attribute('color')),
+    ('slug', attribute('slug')),
+)
+
+RECIPE_INGREDIENT_PLAN = (
+    ('id', attribute('ingredient.id')),
+    ('name', attribute('ingredient.name')),
+    ('measurement_unit', attribute('ingredient.measurement_unit')),
+    ('amount', attribute('amount')),
+)
+
+
+class FastRecipeSerializer(FastSerializer):
+    """Аналог RecipeSerializer для списка рецептов.
+
+    Ожидает кверисет с `with_user_flags` и предзагруженными автором,
+    тегами и `recipe_ingredients`.
+    """
+
+    plan = (
+        ('id', attribute('id')),
+        ('tags', nested_many(TAG_PLAN, 'tags')),
+        ('author', nested(USER_PLAN, 'author')),
+        ('ingredients', nested_many(
+            RECIPE_INGREDIENT_PLAN, 'recipe_ingredients'
+        )),
+        ('is_favorited', attribute('is_favorited')),
+        ('is_in_shopping_cart', attribute('is_in_shopping_cart')),
+        ('name', attribute('name')),
+        ('image', image_url('image')),
+        ('image_variants', lambda obj, serializer: get_image_variants(
+            obj, serializer.request
+        )),
+        ('text', attribute('text')),
+        ('cooking_time', attribute('cooking_time')),
+    )
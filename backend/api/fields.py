@@ -0,0 +1,123 @@
+import binascii
+import uuid
+
+import filetype
+from django.conf import settings
+from django.core.files.uploadedfile import (TemporaryUploadedFile,
+                                            UploadedFile)
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+# Длина фрагмента строки base64, декодируемого за один раз.
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """Base64ImageField, который не держит изображение в памяти целиком.
+
+    Строка base64 декодируется фрагментами во временный файл. Размер
+    проверяется до декодирования, а размеры в пикселях - по заголовку
+    изображения, до его полной загрузки. Принимает и загруженные файлы
+    из multipart-запросов с теми же ограничениями.
+    """
+
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+        'max_pixels': (
+            'Изображение не должно быть больше {max_pixels} пикселей.'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, UploadedFile):
+            self.check_size(data.size)
+        elif isinstance(data, str):
+            data = self.decode(data)
+        else:
+            return super().to_internal_value(data)
+        try:
+            self.check_image(data)
+            # Пропускаем декодирование Base64FieldMixin: файл уже готов.
+            return super(Base64FieldMixin, self).to_internal_value(data)
+        except ValidationError:
+            data.close()
+            raise
+
+    def check_size(self, size):
+        if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.fail('max_size', max_size=settings.IMAGE_UPLOAD_MAX_SIZE)
+
+    def decode(self, data):
+        start = data.find(';base64,')
+        start = 0 if start == -1 else start + len(';base64,')
+        file = TemporaryUploadedFile(
+            str(uuid.uuid4()), None, 0, settings.DEFAULT_CHARSET
+        )
+        try:
+            for chunk in self.quanta(data, start):
+                file.write(binascii.a2b_base64(chunk))
+                self.check_size(file.tell())
+        except (binascii.Error, ValueError):
+            file.close()
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        except ValidationError:
+            file.close()
+            raise
+        file.size = file.tell()
+        file.seek(0)
+        extension = filetype.guess_extension(file.read(261))
+        file.seek(0)
+        if extension not in self.ALLOWED_TYPES:
+            file.close()
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        extension = 'jpg' if extension == 'jpeg' else extension
+        file.name = f'{file.name}.{extension}'
+        return file
+
+    @staticmethod
+    def quanta(data, start):
+        """Фрагменты base64 без пробельных символов, кратные 4 символам.
+
+        Строка может быть разбита на строки (MIME), поэтому остаток
+        фрагмента переносится в следующий, а не декодируется отдельно.
+        """
+        rest = ''
+        for offset in range(start, len(data), CHUNK_SIZE):
+            chunk = rest + ''.join(data[offset:offset + CHUNK_SIZE].split())
+            end = len(chunk) - len(chunk) % 4
+            rest = chunk[end:]
+            if end:
+                yield chunk[:end]
+        if rest:
+            yield rest
+
+    def check_image(self, file):
+        """Проверяет размеры изображения, читая только заголовок."""
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            file.seek(0)
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail('max_pixels', max_pixels=settings.IMAGE_MAX_PIXELS)
+
+
+class CloseImageMixin:
+    """Закрывает загруженное изображение после сохранения сериализатора.
+
+    Временный файл перемещается хранилищем в MEDIA_ROOT, и без явного
+    закрытия при сборке мусора возникает ошибка удаления.
+    """
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
@@ -1,6 +1,7 @@
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import get_ingredient_search
 
 
 class RecipeFilter(FilterSet):
@@ -13,6 +14,11 @@ class RecipeFilter(FilterSet):
         method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='ordering_filter')
+
+    POPULAR_ORDERING = ('-favorites_count', '-pub_date', '-id')
 
     class Meta:
         model = Recipe
@@ -33,10 +39,18 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shoppings__user=user)
         return queryset
 
+    def ordering_filter(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by(*self.POPULAR_ORDERING)
+        return queryset
+
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = filters.CharFilter(method='name_filter')
 
     class Meta:
         model = Ingredient
         fields = ('name', )
+
+    def name_filter(self, queryset, name, value):
+        return get_ingredient_search().search(queryset, value)
@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('db', 'app', 'render', 'total')
+
+
+class QueryBudgetExceeded(Exception):
+    """Эндпоинт превысил бюджет из настройки `QUERY_BUDGETS`."""
+
+
+class RequestMetrics:
+    """Запросы к БД и время их выполнения в рамках одного HTTP-запроса.
+
+    Асинхронные представления выполняют запросы параллельно в нескольких
+    потоках, поэтому счетчики обновляются под блокировкой.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self._lock = Lock()
+
+    def record(self, duration):
+        with self._lock:
+            self.queries += 1
+            self.db_time += duration
+
+
+# Замеры текущего запроса. Контекст копируется в потоки sync_to_async,
+# поэтому запросы из пула потоков попадают в замеры того же HTTP-запроса.
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """Обертка `execute_wrapper`, установленная на все соединения с БД."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record(time.perf_counter() - started)
+
+
+def install_query_counter(connection, **kwargs):
+    """Добавляет `count_queries` к соединению (сигнал `connection_created`).
+
+    У каждого потока свои соединения, поэтому обертка ставится на все,
+    а не только на соединение потока, который обрабатывает запрос.
+    """
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def percentile(values, percent):
+    """Перцентиль отсортированного списка методом ближайшего ранга."""
+    if not values:
+        return 0
+    index = min(len(values) - 1, len(values) * percent // 100)
+    return values[index]
+
+
+class EndpointStats:
+    """Последние замеры по каждому эндпоинту в памяти процесса.
+
+    Если задан `QUERY_STATS_DIR`, снимок периодически сохраняется в файл
+    `<pid>.json`, откуда его читает команда `query_report`.
+    """
+
+    def __init__(self, size, directory=None, flush_interval=10):
+        self.samples = defaultdict(lambda: deque(maxlen=size))
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._flushed_at = time.monotonic()
+        self._lock = Lock()
+
+    def record(self, endpoint, queries, timings):
+        with self._lock:
+            self.samples[endpoint].append({'queries': queries, **timings})
+            flush = (
+                self.directory
+                and time.monotonic() - self._flushed_at > self.flush_interval
+            )
+            if flush:
+                self._flushed_at = time.monotonic()
+                snapshot = self.snapshot()
+        if flush:
+            self.flush(snapshot)
+
+    def snapshot(self):
+        return {
+            endpoint: list(samples)
+            for endpoint, samples in self.samples.items()
+        }
+
+    def flush(self, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file)
+        os.replace(f'{path}.tmp', path)
+
+
+endpoint_stats = EndpointStats(
+    settings.QUERY_STATS_SAMPLES,
+    settings.QUERY_STATS_DIR,
+    settings.QUERY_STATS_FLUSH_INTERVAL
+)
+
+
+def check_budget(endpoint, queries, timings):
+    budget = settings.QUERY_BUDGETS.get(endpoint)
+    if not budget:
+        return
+    errors = []
+    if queries > budget.get('queries', queries):
+        errors.append(f'{queries} queries > {budget["queries"]}')
+    if timings['db'] > budget.get('db_ms', timings['db']):
+        errors.append(f'db {timings["db"]:.1f}ms > {budget["db_ms"]}ms')
+    if not errors:
+        return
+    message = f'{endpoint} exceeded its budget: {", ".join(errors)}'
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
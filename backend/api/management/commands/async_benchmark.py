@@ -0,0 +1,142 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import include, path
+from django.utils.http import urlencode
+from rest_framework.authtoken.models import Token
+
+from api.instrumentation import percentile
+from api.urls import async_urlpatterns, sync_urlpatterns
+from recipes.models import Recipe
+from users.models import User
+
+
+def urlconf(name, urlpatterns):
+    module = ModuleType(name)
+    module.urlpatterns = [path('api/', include(urlpatterns))]
+    return module
+
+
+SYNC_URLCONF = urlconf('sync_urls', sync_urlpatterns)
+ASYNC_URLCONF = urlconf('async_urls', async_urlpatterns + sync_urlpatterns)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sync WSGI and async ASGI throughput of the read endpoints "
+        "at equal concurrency: WSGI requests run in --workers threads, "
+        "ASGI requests run as --workers concurrent tasks in one event loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent requests in both modes',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per endpoint and mode',
+        )
+        parser.add_argument(
+            '--user',
+            help=(
+                'Username to authenticate as. Anonymous responses are '
+                'cached, so without it mostly the cache is measured'
+            ),
+        )
+
+    def get_paths(self, user):
+        recipe = Recipe.objects.order_by('pk').first()
+        if recipe is None:
+            raise CommandError('No recipes to benchmark')
+        ingredient = recipe.ingredients.values_list('name', flat=True).first()
+        paths = [
+            '/api/recipes/',
+            f'/api/recipes/{recipe.pk}/',
+            '/api/tags/',
+            '/api/ingredients/?' + urlencode({'name': ingredient[:2]})
+            if ingredient else '/api/ingredients/',
+        ]
+        if user is not None:
+            paths.append('/api/users/subscriptions/?recipes_limit=3')
+        return paths
+
+    def run_wsgi(self, url, requests, workers, token):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+
+        def get(_):
+            started = time.perf_counter()
+            response = Client().get(url, **headers)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            started = time.perf_counter()
+            latencies = list(executor.map(get, range(requests)))
+            total = time.perf_counter() - started
+        return total, latencies
+
+    def run_asgi(self, url, requests, workers, token):
+        headers = {'authorization': f'Token {token}'} if token else {}
+
+        async def worker(client, queue, latencies):
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.get(url, **headers)
+                if response.status_code != 200:
+                    raise CommandError(f'{url}: {response.status_code}')
+                latencies.append(time.perf_counter() - started)
+
+        async def main():
+            queue = asyncio.Queue()
+            for number in range(requests):
+                queue.put_nowait(number)
+            latencies = []
+            client = AsyncClient()
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                worker(client, queue, latencies) for _ in range(workers)
+            ))
+            return time.perf_counter() - started, latencies
+
+        return asyncio.run(main())
+
+    def handle(self, *args, **options):
+        user = None
+        token = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'User {options["user"]} not found')
+            token = Token.objects.get_or_create(user=user)[0].key
+        workers, requests = options['workers'], options['requests']
+        modes = (
+            ('wsgi', SYNC_URLCONF, self.run_wsgi),
+            ('asgi', ASYNC_URLCONF, self.run_asgi),
+        )
+        for url in self.get_paths(user):
+            for mode, root_urlconf, run in modes:
+                with override_settings(
+                    ROOT_URLCONF=root_urlconf,
+                    # Хост, который подставляют тестовые клиенты.
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+                ):
+                    total, latencies = run(url, requests, workers, token)
+                latencies = sorted(latency * 1000 for latency in latencies)
+                self.stdout.write(
+                    f'{mode} {url}: {requests / total:.0f} req/s, '
+                    f'p50 {percentile(latencies, 50):.1f}ms, '
+                    f'p95 {percentile(latencies, 95):.1f}ms'
+                )
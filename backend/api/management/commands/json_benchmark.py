@@ -0,0 +1,70 @@
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import ORJSONRenderer, orjson
+from api.serializers import IngredientSerializer, RecipeSerializer
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = "Compare JSONRenderer and ORJSONRenderer on API payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=20,
+            help='Renders per measurement',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100,
+            help='Number of recipes in the recipe payload',
+        )
+
+    def get_payloads(self, recipes_limit):
+        request = APIRequestFactory().get('/api/recipes/')
+        request.user = AnonymousUser()
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            'tags'
+        ).with_user_flags(request.user)[:recipes_limit]
+        return {
+            'recipes': RecipeSerializer(
+                recipes, many=True, context={'request': request}
+            ).data,
+            'ingredients': IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data,
+        }
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write('[!] orjson is not installed')
+            return
+        number = options['number']
+        renderers = (JSONRenderer(), ORJSONRenderer())
+        for name, data in self.get_payloads(options['recipes']).items():
+            outputs = [renderer.render(data) for renderer in renderers]
+            if outputs[0] != outputs[1]:
+                self.stdout.write(f'[!] {name}: output differs')
+            timings = [
+                min(timeit.repeat(
+                    lambda: renderer.render(data), number=number, repeat=3
+                )) / number * 1000
+                for renderer in renderers
+            ]
+            self.stdout.write(
+                f'{name}: {len(data)} objects, {len(outputs[0])} bytes, '
+                f'json {timings[0]:.2f}ms, orjson {timings[1]:.2f}ms, '
+                f'x{timings[0] / timings[1]:.1f}'
+            )
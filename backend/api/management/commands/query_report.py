@@ -0,0 +1,57 @@
+import glob
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.instrumentation import METRICS, percentile
+
+
+class Command(BaseCommand):
+    help = "Print per-endpoint query count and timing percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Remove collected snapshots after printing the report',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.QUERY_STATS_DIR:
+            raise CommandError('QUERY_STATS_DIR is not configured.')
+        paths = glob.glob(os.path.join(settings.QUERY_STATS_DIR, '*.json'))
+        samples = defaultdict(list)
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as file:
+                for endpoint, endpoint_samples in json.load(file).items():
+                    samples[endpoint].extend(endpoint_samples)
+        if not samples:
+            self.stdout.write('No samples collected yet.')
+            return
+
+        self.stdout.write(
+            f'{"endpoint":<45}{"n":>7}{"queries p50/p99/max":>22}'
+            + ''.join(f'{name + " p50/p95/p99 ms":>28}' for name in METRICS)
+        )
+        for endpoint in sorted(samples):
+            rows = samples[endpoint]
+            queries = sorted(row['queries'] for row in rows)
+            queries_column = (
+                f'{percentile(queries, 50)}/{percentile(queries, 99)}'
+                f'/{queries[-1]}'
+            )
+            line = f'{endpoint:<45}{len(rows):>7}{queries_column:>22}'
+            for name in METRICS:
+                values = sorted(row[name] for row in rows)
+                line += '{:>28}'.format('/'.join(
+                    f'{percentile(values, percent):.1f}'
+                    for percent in (50, 95, 99)
+                ))
+            self.stdout.write(line)
+
+        if options['clear']:
+            for path in paths:
+                os.remove(path)
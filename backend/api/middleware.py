@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .instrumentation import (RequestMetrics, check_budget, current_metrics,
+                              endpoint_stats, install_query_counter)
+
+
+def get_endpoint(view_func, method):
+    """Имя эндпоинта: `RecipeViewSet.list`, `UserViewSet.subscriptions`."""
+    # Асинхронные представления (api.async_views) учитываются
+    # под именем вьюсета, который они заменяют.
+    view_func = getattr(view_func, 'sync_view', view_func)
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method.lower(), method)}'
+
+
+class QueryBudgetMiddleware:
+    """Замеры запросов к БД и времени ответа по эндпоинтам.
+
+    Добавляет заголовок Server-Timing, копит статистику в `endpoint_stats`
+    и сверяет успешные ответы с `QUERY_BUDGETS`. Для потоковых ответов
+    учитываются только запросы, выполненные до начала отдачи тела.
+
+    Работает и в синхронном, и в асинхронном режиме, поэтому под ASGI
+    не переводит асинхронные представления в синхронные. Запросы
+    считаются на всех соединениях, включая соединения потоков
+    `sync_to_async(thread_sensitive=False)`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в django.utils.deprecation.MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        connection_created.connect(install_query_counter)
+        for connection in connections.all():
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, time.perf_counter() - started)
+
+    def start(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        return current_metrics.set(metrics)
+
+    def finish(self, request, response, total):
+        endpoint = getattr(request, 'endpoint', None)
+        if endpoint is None:
+            return response
+        metrics = request.metrics
+        timings = {
+            'db': metrics.db_time * 1000,
+            'app': (total - metrics.db_time - metrics.render_time) * 1000,
+            'render': metrics.render_time * 1000,
+            'total': total * 1000,
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration:.1f}'
+            + (f';desc="{metrics.queries} queries"' if name == 'db' else '')
+            for name, duration in timings.items()
+        )
+        endpoint_stats.record(endpoint, metrics.queries, timings)
+        # Ответы с ошибками идут другим путем, бюджеты их не ограничивают.
+        if response.status_code < 400:
+            check_budget(endpoint, metrics.queries, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.endpoint = get_endpoint(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        render = response.render
+        metrics = request.metrics
+
+        def timed_render():
+            started = time.perf_counter()
+            try:
+                return render()
+            finally:
+                metrics.render_time += time.perf_counter() - started
+
+        response.render = timed_render
+        return response
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+import hashlib
 from typing import TYPE_CHECKING, Optional, Type
 
-from rest_framework import mixins, viewsets
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date, urlencode
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
+
+from .caching import get_generation
 
 if TYPE_CHECKING:
     from rest_framework.serializers import Serializer
@@ -40,3 +49,174 @@ class ModelMultiSerializerViewSetMixin(
     viewsets.GenericViewSet
 ):
     pass
+
+
+class AnonymousCacheMixin:
+    """Кэширование ответов list/retrieve для анонимных пользователей.
+
+    Ключ строится из пути, нормализованной строки запроса и поколений
+    моделей из `cache_models`, поэтому любая запись в эти модели делает
+    старые записи кэша недостижимыми. ETag совпадает с ключом кэша.
+    """
+
+    cache_models = ()
+
+    def get_response_cache_key(self, request):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return None
+        query = urlencode(sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+        ), doseq=True)
+        generations = [get_generation(model) for model in self.cache_models]
+        digest = hashlib.md5(
+            f'{request.path}?{query}:{request.accepted_renderer.format}:'
+            f'{generations}'.encode()
+        ).hexdigest()
+        return f'response:{digest}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        etag = f'"{key.split(":")[1]}"'
+        cached = cache.get(key)
+        if cached is not None:
+            data, last_modified = cached
+            response = get_conditional_response(
+                request, etag=etag,
+                last_modified=last_modified and parse_http_date(last_modified)
+            )
+            if response is None:
+                response = Response(data)
+            if last_modified:
+                response['Last-Modified'] = last_modified
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(
+                key,
+                (response.data, response.get('Last-Modified')),
+                settings.RESPONSE_CACHE_TIMEOUT
+            )
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list/retrieve без полной сериализации.
+
+    ETag считается по версиям (`get_version`) объектов страницы и по
+    поколениям моделей `etag_models`. Если в запросе есть условные
+    заголовки, версии достаются из `get_version_queryset` одним легким
+    запросом, и на совпавший ETag ответ 304 отдается без сериализации.
+    Иначе ETag считается по объектам, уже загруженным для ответа.
+    Last-Modified отдается только анонимным пользователям: для остальных
+    ответ зависит еще и от флагов.
+    """
+
+    version_fields = ()
+    etag_models = ()
+    last_modified_field = None
+    version_objects = None
+
+    def get_version_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def get_version(self, obj):
+        return tuple(getattr(obj, field) for field in self.version_fields)
+
+    def get_etag(self, request, objects, extra=None):
+        versions = [self.get_version(obj) for obj in objects]
+        generations = [get_generation(model) for model in self.etag_models]
+        digest = hashlib.md5(repr((
+            versions, extra, generations, request.accepted_renderer.format
+        )).encode()).hexdigest()
+        return f'"{digest}"'
+
+    def get_last_modified(self, request, obj):
+        if request.user.is_authenticated or not self.last_modified_field:
+            return None
+        return getattr(obj, self.last_modified_field).timestamp()
+
+    @staticmethod
+    def is_conditional(request):
+        return any(
+            header in request.META
+            for header in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+        )
+
+    @staticmethod
+    def set_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def conditional_response(self, request, handler, etag, last_modified,
+                             *args, **kwargs):
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        self.version_objects = page
+        return page
+
+    def get_object(self):
+        obj = super().get_object()
+        self.version_objects = [obj]
+        return obj
+
+    def get_page_extra(self, page):
+        return None if page is None else self.get_paginated_response([]).data
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            response = super().list(request, *args, **kwargs)
+            if self.version_objects is None:
+                return response
+            return self.set_validators(response, self.get_etag(
+                request, self.version_objects,
+                self.get_page_extra(self.version_objects)
+            ), None)
+        queryset = self.get_version_queryset()
+        page = self.paginate_queryset(queryset)
+        objects = list(queryset) if page is None else page
+        etag = self.get_etag(request, objects, self.get_page_extra(page))
+        return self.conditional_response(
+            request, super().list, etag, None, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            response = super().retrieve(request, *args, **kwargs)
+            obj = self.version_objects[0]
+            return self.set_validators(
+                response, self.get_etag(request, [obj]),
+                self.get_last_modified(request, obj)
+            )
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(
+            self.get_version_queryset(),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, obj)
+        return self.conditional_response(
+            request, super().retrieve, self.get_etag(request, [obj]),
+            self.get_last_modified(request, obj), *args, **kwargs
+        )
@@ -1,7 +1,161 @@
+from base64 import b64decode, b64encode
+from datetime import datetime
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination, _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .counts import get_count
+
+
+class CountStrategyPaginator(Paginator):
+    """Paginator, получающий количество объектов через `count_strategy`."""
+
+    def __init__(self, *args, count_strategy=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_strategy = count_strategy
+
+    @cached_property
+    def count(self):
+        if self.count_strategy is None:
+            return super().count
+        return self.count_strategy(self.object_list)
 
 
 class CustomPaginator(PageNumberPagination):
     page_size = settings.PAGE_SIZE
     page_size_query_param = 'limit'
+
+    count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        # Вьюсет может пагинировать один и тот же список дважды
+        # (см. ConditionalGetMixin), количество считается один раз.
+        if self.count is None:
+            self.count = get_count(queryset, self.request, self.view)
+        return self.count
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountStrategyPaginator(
+            object_list, per_page, count_strategy=self.get_count
+        )
+
+
+class CursorPaginator(CursorPagination):
+    """Курсорная пагинация без OFFSET и COUNT(*).
+
+    Порядок задается атрибутом `cursor_ordering` вьюсета.
+    """
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
+
+
+class OptionalCursorPaginator(BasePagination):
+    """Постраничная пагинация, курсорная по запросу клиента.
+
+    Курсорный режим включается параметром `pagination=cursor`
+    или наличием параметра `cursor` в ссылках `next`/`previous`.
+    """
+
+    def __init__(self):
+        self.page_number_paginator = CustomPaginator()
+        self.cursor_paginator = CursorPaginator()
+        self.paginator = self.page_number_paginator
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_paginator.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.paginator = self.cursor_paginator
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_paginator.get_paginated_response_schema(
+            schema
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_paginator.get_schema_operation_parameters(
+            view
+        )
+
+
+class FeedPaginator(BasePagination):
+    """Keyset-пагинация ленты по паре (pub_date, id) последнего рецепта.
+
+    Страницу загружает функция `fetch(cursor, limit)`, которая
+    возвращает отсортированный по убыванию список (pub_date, id).
+    """
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, pk = b64decode(
+                encoded.encode('ascii'), altchars=b'-_'
+            ).decode('ascii').split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item):
+        pub_date, pk = item
+        encoded = b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode('ascii'), altchars=b'-_'
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def paginate(self, request, fetch):
+        """Список (pub_date, id) текущей страницы."""
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        items = fetch(self.decode_cursor(request), page_size + 1)
+        self.next = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            self.next = self.encode_cursor(items[-1])
+        return items
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.next, 'results': data})
@@ -0,0 +1,131 @@
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же выводом, что и у DRF.
+
+    Типы, которые orjson не поддерживает или кодирует иначе (datetime,
+    Decimal, ленивые строки), передаются в encoder DRF. Без orjson,
+    при запросе отступов или ошибке кодирования работает JSONRenderer.
+    """
+
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context
+        ) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=JSONEncoder().default, option=self.options
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029 для JavaScript.
+        return content.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    @staticmethod
+    def write(value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=ABCMeta):
+    """Базовый рендерер списка покупок.
+
+    `stream` отдает список покупок по частям для StreamingHttpResponse,
+    `render` используется для обычных ответов (например, ошибок).
+    """
+
+    charset = 'utf-8'
+
+    @abstractmethod
+    def stream(self, rows):
+        """Части списка покупок в виде строк."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode(self.charset)
+        return ''.join(self.stream(data or [])).encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield 'Foodgram\nСписок покупок:\n'
+        for row in rows:
+            yield (
+                f'{row["ingredient__name"]}, {row["amount"]} '
+                f'{row["ingredient__measurement_unit"]}\n'
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            yield writer.writerow((
+                row['ingredient__name'],
+                row['ingredient__measurement_unit'],
+                row['amount'],
+            ))
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, rows):
+        separator = '['
+        for row in rows:
+            yield separator + json.dumps({
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+)
@@ -1,13 +1,21 @@
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from recipes.models import (FavoriteList, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingList, Tag)
+                            ShoppingCartTotal, ShoppingList, SimilarRecipe,
+                            Tag)
 from users.models import Subscribe, User
+from users.subscriptions import is_subscribed
+
+from .fields import CloseImageMixin, StreamingBase64ImageField
+from .utils import get_image_url, get_image_variants, get_recipes_limit
 
 
 class UserReadSerializer(UserSerializer):
@@ -27,13 +35,7 @@ class UserReadSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        if (self.context.get('request')
-           and not self.context['request'].user.is_anonymous):
-            return Subscribe.objects.filter(
-                user=self.context['request'].user,
-                author=obj
-            ).exists()
-        return False
+        return is_subscribed(self.context.get('request'), obj)
 
 
 class UserCreateSerializer(UserCreateSerializer):
@@ -78,14 +80,14 @@ class SetPasswordSerializer(serializers.Serializer):
                 {'new_password': 'Новый пароль должен отличаться от текущего.'}
             )
         instance.set_password(validated_data['new_password'])
-        instance.save()
+        instance.save(update_fields=['password'])
         return validated_data
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
     """Список рецептов без ингридиентов."""
 
-    image = Base64ImageField(read_only=True)
+    image = serializers.SerializerMethodField()
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
@@ -98,6 +100,9 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'cooking_time'
         )
 
+    def get_image(self, obj):
+        return get_image_url(obj, 'thumbnail', self.context.get('request'))
+
 
 class TagSerializer(serializers.ModelSerializer):
     """Сериализатор для тега."""
@@ -154,6 +159,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -166,11 +172,17 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
+    def get_image_variants(self, obj):
+        return get_image_variants(obj, self.context.get('request'))
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -178,9 +190,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         return FavoriteList.objects.filter(recipe=obj, user=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
-        return (request.user.is_authenticated
-                and obj.shoppings.filter(user=request.user).exists())
+        if request is None or request.user.is_anonymous:
+            return False
+        return obj.shoppings.filter(user=request.user).exists()
 
 
 class IngredientCreateSerializer(serializers.ModelSerializer):
@@ -199,11 +214,27 @@ class IngredientCreateSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeUpdateMixin:
+    """Сохраняет при изменении рецепта только отредактированные поля.
+
+    Полный `save()` записал бы прочитанные в начале запроса счетчики
+    избранного и корзин и варианты изображения, затерев изменения,
+    сделанные за это время другими запросами.
+    """
+
+    def update(self, recipe, validated_data):
+        for attr, value in validated_data.items():
+            setattr(recipe, attr, value)
+        recipe.save(update_fields=[*validated_data, 'updated_at'])
+        return recipe
+
+
+class RecipeCreateSerializer(RecipeUpdateMixin, CloseImageMixin,
+                             serializers.ModelSerializer):
     """Сериализатор для создания рецепта."""
 
     ingredients = IngredientCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -233,15 +264,40 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         self.tags_ingredients_create(recipe, tags, ingredients)
+        self.update_similar(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        old_amounts = ShoppingCartTotal.objects.recipe_amounts(recipe)
         RecipeIngredient.objects.filter(recipe=recipe).delete()
         self.tags_ingredients_create(recipe, tags, ingredients)
+        ShoppingCartTotal.objects.change_recipe(recipe, old_amounts)
+        self.update_similar(recipe)
         return super().update(recipe, validated_data)
 
+    @staticmethod
+    def update_similar(recipe):
+        transaction.on_commit(
+            lambda: SimilarRecipe.objects.update_recipe(recipe.pk)
+        )
+
+    def to_representation(self, instance):
+        return RecipeSerializer(instance, context=self.context).data
+
+
+class RecipeImageSerializer(RecipeUpdateMixin, CloseImageMixin,
+                            serializers.ModelSerializer):
+    """Замена изображения рецепта файлом из multipart-запроса."""
+
+    image = StreamingBase64ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ('image',)
+
     def to_representation(self, instance):
         return RecipeSerializer(instance, context=self.context).data
 
@@ -267,23 +323,20 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return (
-            self.context.get('request').user.is_authenticated
-            and Subscribe.objects.filter(
-                user=self.context['request'].user,
-                author=obj
-            ).exists()
-        )
+        # В списке подписок все авторы уже отслеживаются пользователем.
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit_recipes = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit_recipes is not None:
-            recipes = recipes[:(int(limit_recipes))]
-        context = {'request': request}
-        return RecipeListSerializer(recipes, many=True,
-                                    context=context).data
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        return RecipeListSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
 
 class SubscribeSerializer(serializers.Serializer):
@@ -298,9 +351,7 @@ class SubscribeSerializer(serializers.Serializer):
         user = self.context.get('request').user
         author = get_object_or_404(User, pk=validated_data['id'])
         Subscribe.objects.create(user=user, author=author)
-        serializer = SubscriptionSerializer(
-            author, context={'request': self.context.get('request')}
-        )
+        serializer = SubscriptionSerializer(author, context=self.context)
         return serializer.data
 
 
@@ -314,14 +365,16 @@ class FavoriteListSerializer(serializers.ModelSerializer):
             'user'
         )
 
-    @staticmethod
-    def validate(data):
-        user = data['user']
-        if user.favorites.filter(recipe=data['recipe']).exists():
-            raise serializers.ValidationError(
-                'Рецепт уже добавлен в избранное.'
-            )
-        return data
+    def create(self, validated_data):
+        if not FavoriteList.objects.add_recipe(
+            validated_data['user'], validated_data['recipe'].pk
+        ):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Рецепт уже добавлен в избранное.'
+                ]
+            })
+        return FavoriteList(**validated_data)
 
     def to_representation(self, instance):
         return RecipeListSerializer(
@@ -333,22 +386,42 @@ class FavoriteListSerializer(serializers.ModelSerializer):
 class ShoppingListSerializer(serializers.Serializer):
     """Добавление и удаление рецептов из корзины покупок."""
 
-    def validate(self, data):
-        recipe_id = self.context['recipe_id']
-        user = self.context['request'].user
-        if ShoppingList.objects.filter(
-                user=user, recipe_id=recipe_id
-        ).exists():
-            raise serializers.ValidationError(
-                'Этот рецепт уже есть в списке покупок'
-            )
-        return data
-
     def create(self, validated_data):
         recipe = get_object_or_404(Recipe, pk=validated_data['id'])
-        ShoppingList.objects.create(
-            user=self.context['request'].user,
-            recipe=recipe
-        )
+        if not ShoppingList.objects.add_recipe(
+            self.context['request'].user, recipe.pk
+        ):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Этот рецепт уже есть в списке покупок'
+                ]
+            })
         serializer = RecipeListSerializer(recipe)
         return serializer.data
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    """Списки id рецептов для массового добавления и удаления."""
+
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list
+    )
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError(
+                'Передайте рецепты в поле add или remove.'
+            )
+        if len(data['add']) + len(data['remove']) > settings.BULK_RECIPES_MAX:
+            raise serializers.ValidationError(
+                f'За один запрос можно изменить не больше '
+                f'{settings.BULK_RECIPES_MAX} рецептов.'
+            )
+        if set(data['add']) & set(data['remove']):
+            raise serializers.ValidationError(
+                'Рецепт не может быть одновременно в add и remove.'
+            )
+        return data
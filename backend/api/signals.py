@@ -0,0 +1,44 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+from .caching import bump_generation
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(sender, **kwargs):
+    bump_generation(Recipe)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_generation(Tag)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    bump_generation(Ingredient)
+
+
+# Поля пользователя, которые попадают в ответы API.
+USER_RENDERED_FIELDS = frozenset(
+    ('username', 'first_name', 'last_name', 'email')
+)
+
+
+@receiver(post_save, sender=User)
+def invalidate_users_on_save(sender, created, update_fields=None, **kwargs):
+    # Обновление last_login при каждом входе ответы не меняет.
+    if created or update_fields is None or (
+        USER_RENDERED_FIELDS.intersection(update_fields)
+    ):
+        bump_generation(User)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_users(sender, **kwargs):
+    bump_generation(User)
@@ -0,0 +1,96 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteList, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCartTotal, ShoppingList,
+                            Tag)
+from users.models import User
+from users.subscriptions import followed_authors_cache
+
+# Тесты API выполняются с замерами запросов и падают,
+# если эндпоинт превысил бюджет из QUERY_BUDGETS.
+enforce_budgets = override_settings(
+    QUERY_INSTRUMENTATION=True, QUERY_BUDGET_RAISE=True
+)
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password-12345',
+        first_name='Имя',
+        last_name='Фамилия'
+    )
+
+
+def create_recipes(authors, count):
+    """`count` рецептов по очереди от каждого из авторов."""
+    tags = [
+        Tag.objects.create(name=f'Тег {i}', color='#aabbcc', slug=f'tag{i}')
+        for i in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(name=f'Ингредиент {i}', measurement_unit='г')
+        for i in range(6)
+    ]
+    recipes = []
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            author=authors[i % len(authors)],
+            name=f'Рецепт {i}',
+            text=f'Описание {i}',
+            cooking_time=10,
+            image=f'media/recipe{i}.png',
+            # Варианты изображения не создаются: файла нет.
+            image_variants={'source': f'media/recipe{i}.png'}
+        )
+        recipe.tags.set([tags[i % 3], tags[(i + 1) % 3]])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredients[(i + j) % 6],
+                amount=10 * (j + 1)
+            )
+            for j in range(3)
+        ])
+        recipes.append(recipe)
+    return recipes
+
+
+def api_client(user=None):
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def clear_caches():
+    cache.clear()
+    followed_authors_cache.clear()
+
+
+class CounterAssertions:
+    """Проверка денормализованных данных по таблицам избранного и корзины."""
+
+    def assert_counters(self):
+        for field, model in (
+            ('favorites_count', FavoriteList),
+            ('shopping_count', ShoppingList),
+        ):
+            actual = Counter(model.objects.values_list('recipe', flat=True))
+            for recipe_id, value in Recipe.objects.values_list(
+                'pk', field
+            ):
+                self.assertEqual(value, actual[recipe_id], field)
+        self.assertEqual(
+            {
+                (row.user_id, row.ingredient_id): row.total_amount
+                for row in ShoppingCartTotal.objects.all()
+            },
+            ShoppingCartTotal.objects.calculate()
+        )
@@ -0,0 +1,97 @@
+from django.test import TestCase
+
+from recipes.models import (FavoriteList, Recipe, ShoppingCartTotal,
+                            ShoppingList, TrendingRecipe)
+from users.models import User
+
+from .base import (CounterAssertions, create_recipes, create_user,
+                   enforce_budgets)
+
+
+@enforce_budgets
+class UserRecipeWritesTest(CounterAssertions, TestCase):
+    """Записи в обход API не сбивают счетчики, рейтинг и корзину."""
+
+    MODELS = (FavoriteList, ShoppingList)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com',
+            password='password-12345'
+        )
+        cls.user = create_user('reader')
+        cls.recipes = create_recipes([create_user('author')], 3)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def admin_url(self, model, *parts):
+        path = ''.join(f'{part}/' for part in parts)
+        return f'/admin/recipes/{model._meta.model_name}/{path}'
+
+    def assert_trending(self, positive):
+        for recipe in self.recipes:
+            score = TrendingRecipe.objects.filter(
+                recipe=recipe
+            ).values_list('score', flat=True).first() or 0
+            if recipe.pk in positive:
+                self.assertGreater(score, 0)
+            else:
+                self.assertAlmostEqual(score, 0)
+
+    def test_admin_add_and_delete(self):
+        recipe = self.recipes[0]
+        for model in self.MODELS:
+            with self.subTest(model=model.__name__):
+                response = self.client.post(
+                    self.admin_url(model, 'add'),
+                    {'user': self.user.pk, 'recipe': recipe.pk}
+                )
+                self.assertEqual(response.status_code, 302)
+                self.assert_counters()
+                obj = model.objects.get(user=self.user, recipe=recipe)
+                self.client.post(
+                    self.admin_url(model, obj.pk, 'delete'), {'post': 'yes'}
+                )
+                self.assertFalse(model.objects.exists())
+                self.assert_counters()
+        self.assert_trending(positive=())
+
+    def test_admin_change_is_disabled(self):
+        for model in self.MODELS:
+            obj = model.objects.create(user=self.user, recipe=self.recipes[0])
+            response = self.client.post(
+                self.admin_url(model, obj.pk, 'change'),
+                {'user': self.user.pk, 'recipe': self.recipes[1].pk}
+            )
+            self.assertEqual(response.status_code, 403)
+
+    def test_admin_delete_selected(self):
+        other = create_user('other')
+        for model in self.MODELS:
+            for user in (self.user, other):
+                model.objects.add_recipes(user, [
+                    recipe.pk for recipe in self.recipes
+                ])
+            self.client.post(self.admin_url(model), {
+                'action': 'delete_selected',
+                '_selected_action': list(model.objects.exclude(
+                    user=other, recipe=self.recipes[0]
+                ).values_list('pk', flat=True)),
+                'post': 'yes',
+            })
+            self.assertEqual(model.objects.count(), 1)
+        self.assert_counters()
+        self.assert_trending(positive={self.recipes[0].pk})
+
+    def test_user_delete(self):
+        for model in self.MODELS:
+            model.objects.add_recipes(self.user, [
+                recipe.pk for recipe in self.recipes
+            ])
+        self.user.delete()
+        self.assert_counters()
+        self.assertFalse(ShoppingCartTotal.objects.exists())
+        self.assertFalse(Recipe.objects.filter(favorites_count__gt=0).exists())
+        self.assert_trending(positive=())
@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from api.caching import get_generation
+from users.models import User
+
+from .base import api_client, clear_caches, create_user, enforce_budgets
+
+
+@enforce_budgets
+class UserGenerationTest(TestCase):
+    """Кэш ответов сбрасывают только изменения отображаемых полей."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = create_user('reader')
+
+    def assert_bumped(self, bumped, action):
+        generation = get_generation(User)
+        action()
+        self.assertEqual(get_generation(User) != generation, bumped)
+
+    def test_login_keeps_generation(self):
+        self.assert_bumped(False, lambda: self.assertEqual(
+            api_client().post('/api/auth/token/login/', {
+                'email': self.user.email, 'password': 'password-12345'
+            }).status_code, 200
+        ))
+
+    def test_rendered_fields(self):
+        def rename():
+            self.user.first_name = 'Другое'
+            self.user.save(update_fields=['first_name'])
+
+        self.assert_bumped(True, rename)
+        self.assert_bumped(True, lambda: create_user('other'))
+        self.assert_bumped(True, self.user.delete)
@@ -0,0 +1,122 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import TransactionTestCase, skipUnlessDBFeature
+
+from recipes.models import FavoriteList, ShoppingList, TimelineEntry
+from users.models import Subscribe
+
+from .base import (CounterAssertions, api_client, clear_caches,
+                   create_recipes, create_user, enforce_budgets)
+
+
+@enforce_budgets
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentWritesTest(CounterAssertions, TransactionTestCase):
+    """Одновременные запросы не создают дубликатов и не сбивают счетчики.
+
+    Нужна СУБД с блокировками строк: в SQLite записи выполняются
+    строго по очереди.
+    """
+
+    THREADS = 8
+
+    def setUp(self):
+        clear_caches()
+        self.authors = [create_user(f'author{i}') for i in range(2)]
+        self.user = create_user('reader')
+        self.recipes = create_recipes(self.authors, 6)
+        self.recipe_ids = [recipe.pk for recipe in self.recipes]
+        api_client(self.user)
+
+    def hammer(self, requests):
+        """Выполняет запросы из потоков одновременно, возвращает ответы."""
+        barrier = threading.Barrier(len(requests))
+
+        def run(request):
+            method, url, data = request
+            client = api_client(self.user)
+            try:
+                barrier.wait()
+                return getattr(client, method)(url, data, format='json')
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+            return list(executor.map(run, requests))
+
+    def test_add(self):
+        for prefix in ('favorite', 'shopping_cart'):
+            with self.subTest(prefix=prefix):
+                requests = [
+                    ('post', f'/api/recipes/{prefix}/bulk/',
+                     {'add': self.recipe_ids})
+                    if i % 2 else
+                    ('post', f'/api/recipes/{recipe_id}/{prefix}/', None)
+                    for i, recipe_id in enumerate(
+                        self.recipe_ids[:self.THREADS // 2] * 2
+                    )
+                ]
+                created = Counter()
+                for response in self.hammer(requests):
+                    self.assertIn(response.status_code, (200, 201, 400))
+                    if response.status_code == 201:
+                        created[int(response.request['PATH_INFO'].split(
+                            '/'
+                        )[3])] += 1
+                    elif response.status_code == 200:
+                        created.update(
+                            item['id'] for item in response.json()['add']
+                            if item['status'] == 'created'
+                        )
+                self.assertEqual(created, Counter(self.recipe_ids))
+                self.assert_counters()
+
+    def test_remove(self):
+        for recipe_id in self.recipe_ids:
+            FavoriteList.objects.add_recipe(self.user, recipe_id)
+            ShoppingList.objects.add_recipe(self.user, recipe_id)
+        for prefix in ('favorite', 'shopping_cart'):
+            with self.subTest(prefix=prefix):
+                responses = self.hammer([
+                    ('post', f'/api/recipes/{prefix}/bulk/',
+                     {'remove': self.recipe_ids})
+                    if i % 2 else
+                    ('delete', f'/api/recipes/{self.recipe_ids[0]}/{prefix}/',
+                     None)
+                    for i in range(self.THREADS)
+                ])
+                deleted = Counter()
+                for response in responses:
+                    self.assertIn(response.status_code, (200, 204, 404))
+                    if response.status_code == 204:
+                        deleted[self.recipe_ids[0]] += 1
+                    elif response.status_code == 200:
+                        deleted.update(
+                            item['id'] for item in response.json()['remove']
+                            if item['status'] == 'deleted'
+                        )
+                self.assertEqual(deleted, Counter(self.recipe_ids))
+                self.assert_counters()
+
+    def test_subscribe(self):
+        author = self.authors[0]
+        responses = self.hammer(
+            [('post', f'/api/users/{author.pk}/subscribe/', None)]
+            * self.THREADS
+        )
+        self.assertEqual(
+            sorted(response.status_code for response in responses),
+            [201] + [400] * (self.THREADS - 1)
+        )
+        self.assertEqual(
+            Subscribe.objects.filter(user=self.user, author=author).count(), 1
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.user, author=author
+            ).count(),
+            author.recipes.count()
+        )
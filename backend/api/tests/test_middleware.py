@@ -0,0 +1,75 @@
+import asyncio
+
+from django.conf import settings
+from django.core.checks import run_checks
+from django.http import HttpResponse
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+
+from api.instrumentation import endpoint_stats
+from api.middleware import QueryBudgetMiddleware
+from api.urls import async_urlpatterns, sync_urlpatterns
+
+from .base import (clear_caches, create_recipes, create_user,
+                   enforce_budgets)
+
+urlpatterns = [
+    path('api/', include(async_urlpatterns + sync_urlpatterns)),
+]
+
+
+@enforce_budgets
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncQueryBudgetTest(TransactionTestCase):
+    """Замеры асинхронных представлений (ASYNC_READ_VIEWS).
+
+    Запросы из потоков `sync_to_async(thread_sensitive=False)` идут
+    через отдельные соединения, поэтому тест не оборачивается в транзакцию.
+    """
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.token = Token.objects.create(user=self.user)
+        create_recipes([create_user('author')], 6)
+        clear_caches()
+
+    def test_async_capable(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(asyncio.iscoroutinefunction(
+            QueryBudgetMiddleware(get_response)
+        ))
+        self.assertFalse(asyncio.iscoroutinefunction(
+            QueryBudgetMiddleware(lambda request: HttpResponse())
+        ))
+
+    async def test_counts_worker_thread_queries(self):
+        samples = endpoint_stats.samples['RecipeViewSet.list']
+        recorded = len(samples)
+        response = await self.async_client.get(
+            '/api/recipes/', authorization=f'Token {self.token.key}'
+        )
+        self.assertEqual(response.status_code, 200)
+        # Токен, count и строки страницы, подписки, теги и ингредиенты.
+        self.assertIn('desc="6 queries"', response['Server-Timing'])
+        self.assertEqual(len(samples), recorded + 1)
+        self.assertEqual(samples[-1]['queries'], 6)
+
+
+class AsyncReadViewsCheckTest(SimpleTestCase):
+
+    def check_ids(self, conn_max_age):
+        databases = {
+            'default': {**settings.DATABASES['default'],
+                        'CONN_MAX_AGE': conn_max_age},
+        }
+        with override_settings(ASYNC_READ_VIEWS=True, DATABASES=databases):
+            return [error.id for error in run_checks()]
+
+    def test_requires_persistent_connections(self):
+        self.assertIn('api.E001', self.check_ids(0))
+        self.assertNotIn('api.E001', self.check_ids(60))
+        self.assertNotIn('api.E001', self.check_ids(None))
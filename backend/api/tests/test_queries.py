@@ -0,0 +1,89 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import FavoriteList, ShoppingList
+from users.models import Subscribe
+
+from .base import (api_client, clear_caches, create_recipes, create_user,
+                   enforce_budgets)
+
+
+@enforce_budgets
+class QueryCountTest(TestCase):
+    """Число запросов к БД не зависит от размера страницы.
+
+    Кэши очищаются перед каждым запросом, поэтому замеряется худший
+    случай: без закэшированных ответов, количеств и подписок.
+    """
+
+    LIMITS = (1, 6, 12)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [create_user(f'author{i}') for i in range(3)]
+        cls.user = create_user('reader')
+        cls.recipes = create_recipes(cls.authors, 12)
+        for recipe in cls.recipes[:6]:
+            FavoriteList.objects.add_recipe(cls.user, recipe.pk)
+            ShoppingList.objects.add_recipe(cls.user, recipe.pk)
+        for author in cls.authors:
+            Subscribe.objects.add(cls.user, author.pk)
+
+    def setUp(self):
+        self.anonymous = api_client()
+        self.client = api_client(self.user)
+
+    def count_queries(self, client, url):
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def assert_queries(self, expected, client, url):
+        for limit in self.LIMITS:
+            separator = '&' if '?' in url else '?'
+            paged_url = f'{url}{separator}limit={limit}'
+            with self.subTest(url=paged_url):
+                self.assertEqual(
+                    self.count_queries(client, paged_url), expected
+                )
+
+    def test_recipe_list_anonymous(self):
+        self.assert_queries(4, self.anonymous, '/api/recipes/')
+
+    def test_recipe_list(self):
+        self.assert_queries(6, self.client, '/api/recipes/')
+
+    def test_recipe_list_favorited(self):
+        self.assert_queries(6, self.client, '/api/recipes/?is_favorited=1')
+
+    def test_recipe_list_in_shopping_cart(self):
+        self.assert_queries(
+            6, self.client, '/api/recipes/?is_in_shopping_cart=1'
+        )
+
+    def test_recipe_detail(self):
+        self.assertEqual(self.count_queries(
+            self.client, f'/api/recipes/{self.recipes[0].pk}/'
+        ), 5)
+
+    def test_subscriptions(self):
+        self.assert_queries(
+            4, self.client, '/api/users/subscriptions/?recipes_limit=2'
+        )
+
+    def test_feed(self):
+        self.assert_queries(7, self.client, '/api/recipes/feed/')
+
+    def test_trending(self):
+        self.assertEqual(
+            self.count_queries(self.client, '/api/recipes/trending/'), 2
+        )
+
+    def test_similar(self):
+        # Пустой список похожих: рецепт проверяется отдельным запросом.
+        self.assertEqual(self.count_queries(
+            self.client, f'/api/recipes/{self.recipes[0].pk}/similar/'
+        ), 3)
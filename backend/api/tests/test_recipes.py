@@ -0,0 +1,197 @@
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.serializers import RecipeCreateSerializer
+from recipes.images import process_recipe_image
+from recipes.models import FavoriteList, Recipe, ShoppingList, TrendingRecipe
+
+from .base import (api_client, clear_caches, create_recipes, create_user,
+                   enforce_budgets)
+
+
+@enforce_budgets
+class RecipeUpdateTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipe = create_recipes([cls.author], 1)[0]
+
+    def setUp(self):
+        clear_caches()
+
+    def test_update_keeps_concurrent_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        serializer = RecipeCreateSerializer(recipe, data={
+            'name': 'Новое название',
+            'text': 'Новое описание',
+            'cooking_time': 15,
+            'tags': [tag.pk for tag in self.recipe.tags.all()],
+            'ingredients': [
+                {'id': row.ingredient_id, 'amount': row.amount}
+                for row in self.recipe.recipe_ingredients.all()
+            ],
+        }, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        # Другой запрос добавил рецепт в избранное после чтения рецепта.
+        FavoriteList.objects.add_recipe(create_user('reader'), recipe.pk)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+
+
+@enforce_budgets
+class ImageVariantsTest(TestCase):
+    """Файлы прежних вариантов удаляются при замене изображения."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.recipe = create_recipes([create_user('author')], 1)[0]
+
+    def process(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return process_recipe_image(self.recipe.pk)
+
+    def set_image(self, name):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), 'red').save(buffer, 'PNG')
+        name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=name)
+        return self.process()
+
+    def assert_files(self, variants, exist):
+        for variant in settings.IMAGE_VARIANTS:
+            self.assertEqual(default_storage.exists(variants[variant]), exist)
+
+    def test_replaced_variants_are_deleted(self):
+        first = self.set_image('media/first.png')
+        self.assert_files(first, exist=True)
+        second = self.set_image('media/second.png')
+        self.assert_files(first, exist=False)
+        self.assert_files(second, exist=True)
+        # Повторная обработка того же изображения не удаляет его варианты.
+        self.assertEqual(self.process(), second)
+        self.assert_files(second, exist=True)
+
+
+@enforce_budgets
+class SimilarRecipesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = create_recipes([create_user('author')], 1)[0]
+
+    def test_not_found(self):
+        client = api_client()
+        for pk in ('abc', '999999'):
+            with self.subTest(pk=pk):
+                response = client.get(f'/api/recipes/{pk}/similar/')
+                self.assertEqual(response.status_code, 404)
+        response = client.get(f'/api/recipes/{self.recipe.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+
+
+@enforce_budgets
+class ConditionalGetTest(TestCase):
+    """ETag полного ответа совпадает с ETag условного запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.user = create_user('reader')
+        cls.recipes = create_recipes([cls.author], 3)
+
+    def setUp(self):
+        clear_caches()
+
+    def assert_not_modified(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_not_modified(self):
+        client = api_client(self.user)
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipes[0].pk}/'):
+            with self.subTest(url=url):
+                etag = self.assert_not_modified(client, url)
+                FavoriteList.objects.add_recipe(self.user, self.recipes[0].pk)
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                FavoriteList.objects.remove_recipe(
+                    self.user, self.recipes[0].pk
+                )
+
+    def test_subscription_changes_etag(self):
+        client = api_client(self.user)
+        etag = self.assert_not_modified(client, '/api/recipes/')
+        response = client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        response = client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@enforce_budgets
+class TrendingTest(TestCase):
+    """Инкрементальные оценки совпадают с пересчетом `rebuild`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(f'reader{i}') for i in range(3)]
+        cls.recipes = create_recipes([create_user('author')], 4)
+        cls.recipe_ids = [recipe.pk for recipe in cls.recipes]
+
+    def scores(self, now):
+        """Оценки, приведенные к одному моменту `now`."""
+        return {
+            row.recipe_id: row.score * 2 ** (
+                (row.epoch - now) / settings.TRENDING_HALF_LIFE
+            )
+            for row in TrendingRecipe.objects.all()
+        }
+
+    def test_matches_rebuild(self):
+        for i, user in enumerate(self.users):
+            FavoriteList.objects.add_recipes(user, self.recipe_ids[i:])
+            ShoppingList.objects.add_recipes(user, self.recipe_ids[:i + 1])
+        FavoriteList.objects.remove_recipe(self.users[0], self.recipe_ids[1])
+        now = time.time()
+        incremental = self.scores(now)
+        TrendingRecipe.objects.rebuild(now)
+        rebuilt = self.scores(now)
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for recipe_id, score in rebuilt.items():
+            self.assertAlmostEqual(incremental[recipe_id], score)
+
+    def test_removal_leaves_no_residue(self):
+        for user in self.users:
+            FavoriteList.objects.add_recipes(user, self.recipe_ids)
+            FavoriteList.objects.remove_recipes(user, self.recipe_ids)
+        for score in TrendingRecipe.objects.values_list('score', flat=True):
+            self.assertAlmostEqual(score, 0)
+
+    @override_settings(TRENDING_SIZE=2)
+    def test_size_is_capped(self):
+        for user in self.users:
+            FavoriteList.objects.add_recipes(user, self.recipe_ids[:2])
+        for recipe_id in self.recipe_ids[2:]:
+            FavoriteList.objects.add_recipe(self.users[0], recipe_id)
+        self.assertEqual(
+            set(TrendingRecipe.objects.values_list('recipe_id', flat=True)),
+            set(self.recipe_ids[:2])
+        )
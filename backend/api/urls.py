@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from . import async_views
 from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
 
 router = routers.DefaultRouter()
@@ -10,8 +12,32 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 
-urlpatterns = [
+# Запросы, кроме GET, обслуживают те же представления, что и в router.
+sync_views = {url.name: url.callback for url in router.urls}
+async_urlpatterns = [
+    path('recipes/', async_views.read_view(
+        async_views.recipe_list, sync_views['recipes-list']
+    )),
+    path('recipes/<int:pk>/', async_views.read_view(
+        async_views.recipe_detail, sync_views['recipes-detail']
+    )),
+    path('tags/', async_views.read_view(
+        async_views.tag_list, sync_views['tags-list']
+    )),
+    path('ingredients/', async_views.read_view(
+        async_views.ingredient_list, sync_views['ingredients-list']
+    )),
+    path('users/subscriptions/', async_views.read_view(
+        async_views.subscriptions, sync_views['users-subscriptions']
+    )),
+]
+
+sync_urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
 ]
+
+urlpatterns = (
+    async_urlpatterns if settings.ASYNC_READ_VIEWS else []
+) + sync_urlpatterns
@@ -1,25 +1,49 @@
-from django.db.models import Sum
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F
 
-from recipes.models import RecipeIngredient
+from recipes.images import get_variant
+from recipes.models import ShoppingCartTotal
 
 
-def create_shoping_list(shopping_cart):
-    recipes = shopping_cart.values_list('recipe_id', flat=True)
-    buy_list = RecipeIngredient.objects.filter(
-        recipe__in=recipes
+def get_shopping_list(user, chunk_size=2000):
+    """Ингредиенты из корзины пользователя, суммированные по названию."""
+    return ShoppingCartTotal.objects.filter(
+        user=user
     ).values(
         'ingredient__name',
         'ingredient__measurement_unit',
-    ).annotate(
-        amount=Sum('amount')
-    )
-    buy_list_text = 'Foodgram\nСписок покупок:\n'
-    for item in buy_list:
-        amount = item['amount']
-        name = item['ingredient__name']
-        measurement_unit = item['ingredient__measurement_unit']
-        buy_list_text += (
-            f'{name}, {amount} '
-            f'{measurement_unit}\n'
-        )
-    return buy_list_text
+        amount=F('total_amount'),
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).iterator(chunk_size=chunk_size)
+
+
+def get_recipes_limit(request, param='recipes_limit'):
+    """Значение параметра `recipes_limit` или None, если он не задан."""
+    if request is None:
+        return None
+    try:
+        recipes_limit = int(request.query_params[param])
+    except (KeyError, ValueError):
+        return None
+    return recipes_limit if recipes_limit >= 0 else None
+
+
+def get_image_url(recipe, variant, request=None):
+    """URL варианта изображения, пока его нет - исходного изображения."""
+    if not recipe.image:
+        return None
+    name = get_variant(recipe, variant)
+    url = default_storage.url(name) if name else recipe.image.url
+    if request is None:
+        return url
+    return request.build_absolute_uri(url)
+
+
+def get_image_variants(recipe, request=None):
+    return {
+        variant: get_image_url(recipe, variant, request)
+        for variant in settings.IMAGE_VARIANTS
+    }
@@ -1,27 +1,42 @@
-from django.db.models import Count
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Prefetch, prefetch_related_objects
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.models import FavoriteList, Ingredient, Recipe, ShoppingList, Tag
+from recipes.models import (FavoriteList, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, SimilarRecipe, Tag,
+                            TimelineEntry, TrendingRecipe)
+from recipes.search import in_memory_search
 from users.models import Subscribe, User
+from users.subscriptions import prime_followed_author_ids
 
+from .fast_serializers import FastRecipeSerializer
 from .filters import IngredientFilter, RecipeFilter
-from .mixins import (CreateListRetrieveViewSetMixin,
+from .mixins import (AnonymousCacheMixin, ConditionalGetMixin,
+                     CreateListRetrieveViewSetMixin,
                      ModelMultiSerializerViewSetMixin)
-from .paginations import CustomPaginator
+from .paginations import FeedPaginator, OptionalCursorPaginator
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteListSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeSerializer,
+from .serializers import (BulkRecipesSerializer, FavoriteListSerializer,
+                          IngredientSerializer,
+                          RecipeCreateSerializer, RecipeImageSerializer,
+                          RecipeListSerializer, RecipeSerializer,
                           SetPasswordSerializer, ShoppingListSerializer,
                           SubscribeSerializer, SubscriptionSerializer,
                           TagSerializer, UserCreateSerializer,
                           UserReadSerializer)
-from .utils import create_shoping_list
+from .renderers import SHOPPING_LIST_RENDERERS
+from .utils import get_recipes_limit, get_shopping_list
 
 
 class UserViewSet(CreateListRetrieveViewSetMixin):
@@ -29,7 +44,8 @@ class UserViewSet(CreateListRetrieveViewSetMixin):
 
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
-    pagination_class = CustomPaginator
+    pagination_class = OptionalCursorPaginator
+    cursor_ordering = ('username',)
     serializer_class = UserCreateSerializer
     serializer_classes = {
         'list': UserReadSerializer,
@@ -45,7 +61,9 @@ class UserViewSet(CreateListRetrieveViewSetMixin):
     )
     def me(self, request):
         """Информация о своем аккаунте."""
-        serializer = UserReadSerializer(request.user)
+        serializer = UserReadSerializer(
+            request.user, context={'request': request}
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(
@@ -83,7 +101,19 @@ class UserViewSet(CreateListRetrieveViewSetMixin):
         paginated_queryset = self.paginate_queryset(
             User.objects.filter(
                 subscribing__user=self.request.user
-            ).annotate(recipes_count=Count('recipes'))
+            ).annotate(
+                recipes_count=Count('recipes')
+            ).order_by('username')
+        )
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes.latest_per_author(
+                [author.pk for author in paginated_queryset], recipes_limit
+            )
+        prefetch_related_objects(
+            paginated_queryset,
+            Prefetch('recipes', queryset=recipes, to_attr='recipes_preview')
         )
         serializer = self.serializer_class(
             paginated_queryset,
@@ -108,58 +138,201 @@ class UserViewSet(CreateListRetrieveViewSetMixin):
                 author, data=request.data, context={'request': request}
             )
             serializer.is_valid(raise_exception=True)
-            Subscribe.objects.create(user=user, author=author)
+            if not Subscribe.objects.add(user, author.pk):
+                return Response(
+                    {'errors': 'Вы уже подписаны на этого автора.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            deleted_tuple = Subscribe.objects.filter(
-                user=user, author=author
-            ).delete()
-            if deleted_tuple[0] == 0:
+            if not Subscribe.objects.remove(user, author.pk):
                 return Response(status=status.HTTP_404_NOT_FOUND)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тега."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_models = (Tag,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для ингредиента."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    cache_models = (Ingredient,)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if settings.INGREDIENT_AUTOCOMPLETE and name:
+            return Response(in_memory_search.autocomplete(name))
+        if settings.FAST_SERIALIZERS:
+            return Response(list(
+                self.filter_queryset(self.get_queryset()).values(
+                    *IngredientSerializer.Meta.fields
+                )
+            ))
+        return super().list(request, *args, **kwargs)
 
-class RecipeViewSet(ModelMultiSerializerViewSetMixin):
+
+class RecipeViewSet(AnonymousCacheMixin, ConditionalGetMixin,
+                    ModelMultiSerializerViewSetMixin):
     """Вьюсет для рецепта."""
 
     queryset = Recipe.objects.select_related(
         'author'
-    ).prefetch_related('ingredients', 'tags')
+    ).prefetch_related(
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+        'tags'
+    )
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = CustomPaginator
+    pagination_class = OptionalCursorPaginator
+    user_filter_params = ('is_favorited', 'is_in_shopping_cart')
+    cache_models = (Recipe, Tag, Ingredient, User)
+    version_fields = (
+        'id', 'updated_at', 'is_favorited', 'is_in_shopping_cart'
+    )
+    etag_models = (Tag, Ingredient, User)
+    last_modified_field = 'updated_at'
     serializer_class = RecipeCreateSerializer
     serializer_classes = {
         'list': RecipeSerializer,
         'retrieve': RecipeSerializer,
         'favorite': FavoriteListSerializer,
         'shopping_cart': ShoppingListSerializer,
+        'image': RecipeImageSerializer,
+        'feed': RecipeSerializer,
+        'bulk_favorite': BulkRecipesSerializer,
+        'bulk_shopping_cart': BulkRecipesSerializer,
     }
 
+    @property
+    def cursor_ordering(self):
+        if self.request.query_params.get('ordering') == 'popular':
+            return RecipeFilter.POPULAR_ORDERING
+        return ('-pub_date', '-id')
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'feed') and settings.FAST_SERIALIZERS:
+            return FastRecipeSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve', 'feed'):
+            queryset = queryset.with_user_flags(self.request.user)
+        return queryset
+
+    def get_version_queryset(self):
+        return super().get_version_queryset().select_related(
+            None
+        ).prefetch_related(
+            None
+        ).only(
+            'id', 'author', 'pub_date', 'updated_at'
+        )
+
+    def get_version(self, recipe):
+        # Подписка на автора берется из того же множества, что
+        # и в сериализаторе, без отдельного подзапроса.
+        return (
+            *super().get_version(recipe),
+            recipe.author_id in prime_followed_author_ids(self.request)
+        )
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        followed_ids = prime_followed_author_ids(request)
+        paginator = FeedPaginator()
+        items = paginator.paginate(
+            request,
+            lambda cursor, limit: TimelineEntry.objects.feed(
+                request.user, followed_ids, cursor, limit
+            )
+        )
+        recipes = self.get_queryset().in_bulk([pk for _, pk in items])
+        serializer = self.get_serializer(
+            [recipes[pk] for _, pk in items if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=('get',))
+    def trending(self, request):
+        """Популярные за последнее время рецепты, общие для всех."""
+        limit = get_recipes_limit(request, 'limit') or settings.PAGE_SIZE
+        limit = min(limit, settings.TRENDING_SIZE)
+        key = f'trending:{request.get_host()}:{limit}'
+        data = cache.get(key)
+        if data is None:
+            rows = TrendingRecipe.objects.select_related('recipe')[:limit]
+            data = RecipeListSerializer(
+                [row.recipe for row in rows],
+                many=True,
+                context={'request': request}
+            ).data
+            cache.set(key, data, settings.TRENDING_CACHE_TIMEOUT)
+        response = Response(data)
+        patch_cache_control(
+            response, public=True, max_age=settings.TRENDING_CACHE_TIMEOUT
+        )
+        return response
+
+    @action(detail=True, methods=('get',))
+    def similar(self, request, pk=None):
+        """Похожие рецепты из предрассчитанного списка."""
+        try:
+            pk = Recipe._meta.pk.to_python(pk)
+        except ValidationError:
+            raise Http404
+        recipes = [
+            row.similar for row in SimilarRecipe.objects.filter(
+                recipe_id=pk
+            ).select_related('similar')
+        ]
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = RecipeListSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=True,
+        methods=('PUT',),
+        parser_classes=(MultiPartParser,),
+        permission_classes=(IsAuthenticated, IsAuthorOrReadOnly),
+    )
+    def image(self, request, pk=None):
+        """Замена изображения рецепта файлом из поля `image`."""
+        serializer = self.get_serializer(
+            self.get_object(), data=request.data
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
     @action(
         detail=True,
         methods=('POST',),
@@ -180,10 +353,7 @@ class RecipeViewSet(ModelMultiSerializerViewSetMixin):
     @favorite.mapping.delete
     def destroy_favorite(self, request, pk):
         """Удаление рецепта из избранного."""
-        deleted_tuple = FavoriteList.objects.filter(
-            user=request.user, recipe=pk
-        ).delete()
-        if deleted_tuple[0] == 0:
+        if not FavoriteList.objects.remove_recipe(request.user, pk):
             return Response(status=status.HTTP_404_NOT_FOUND)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -214,24 +384,62 @@ class RecipeViewSet(ModelMultiSerializerViewSetMixin):
         )
 
     def remove_recipe_from_cart(self, request, pk):
-        deleted_tuple = ShoppingList.objects.filter(
-            user=request.user, recipe=pk
-        ).delete()
-        if deleted_tuple[0] == 0:
+        if not ShoppingList.objects.remove_recipe(request.user, pk):
             return Response(status=status.HTTP_404_NOT_FOUND)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def bulk_update_recipes(self, request, manager):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = {}
+        with transaction.atomic():
+            for field, method in (
+                ('remove', manager.remove_recipes),
+                ('add', manager.add_recipes),
+            ):
+                statuses = method(
+                    request.user, serializer.validated_data[field]
+                )
+                results[field] = [
+                    {'id': pk, 'status': item_status}
+                    for pk, item_status in statuses.items()
+                ]
+        return Response(results, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='favorite/bulk',
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        """Добавление и удаление нескольких рецептов в избранном."""
+        return self.bulk_update_recipes(request, FavoriteList.objects)
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='shopping_cart/bulk',
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        """Добавление и удаление нескольких рецептов в корзине."""
+        return self.bulk_update_recipes(request, ShoppingList.objects)
+
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS,
     )
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок."""
-        shopping_cart = ShoppingList.objects.filter(user=self.request.user)
-        buy_list_text = create_shoping_list(shopping_cart)
-        response = HttpResponse(buy_list_text, content_type='text/plain')
+        """Скачивание списка покупок в формате из параметра `format`."""
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(get_shopping_list(request.user)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping-list.txt'
+            f'attachment; filename=shopping-list.{renderer.format}'
         )
         return response
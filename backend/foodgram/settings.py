@@ -10,6 +10,14 @@ load_dotenv()
 
 PAGE_SIZE = 6
 
+# Размер LRU-кэша подписок в процессе (0 - кэш выключен).
+SUBSCRIPTIONS_CACHE_SIZE = env.int('SUBSCRIPTIONS_CACHE_SIZE', default=0)
+
+# Отвечать на поиск ингредиентов из индекса в памяти, без запросов к БД.
+INGREDIENT_AUTOCOMPLETE = env.bool('INGREDIENT_AUTOCOMPLETE', default=False)
+# Максимальное время жизни индекса ингредиентов в памяти, в секундах.
+INGREDIENT_INDEX_TTL = env.int('INGREDIENT_INDEX_TTL', default=300)
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.environ.get('SECRET_KEY', 'YOUR developing key')
@@ -45,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -75,7 +84,9 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Время жизни соединения в секундах (0 - новое на каждый запрос).
+        'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=0),
     }
 }
 
@@ -113,8 +124,98 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Уменьшенные копии изображений рецептов в WebP: вариант -> (ширина, высота).
+IMAGE_VARIANTS = {
+    'thumbnail': (320, 320),
+    'medium': (960, 960),
+}
+IMAGE_WEBP_QUALITY = env.int('IMAGE_WEBP_QUALITY', default=80)
+# Потоки для обработки изображений, 0 - обрабатывать в запросе.
+IMAGE_WORKERS = env.int('IMAGE_WORKERS', default=2)
+# Ограничения загружаемых изображений: размер в байтах и число пикселей.
+IMAGE_UPLOAD_MAX_SIZE = env.int(
+    'IMAGE_UPLOAD_MAX_SIZE', default=15 * 1024 * 1024
+)
+IMAGE_MAX_PIXELS = env.int('IMAGE_MAX_PIXELS', default=40_000_000)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Время жизни закэшированного количества объектов в списках, в секундах.
+COUNT_CACHE_TIMEOUT = env.int('COUNT_CACHE_TIMEOUT', default=30)
+# Брать количество объектов в списках без фильтров из pg_class.reltuples.
+COUNT_ESTIMATE = env.bool('COUNT_ESTIMATE', default=False)
+# Списки рецептов и ингредиентов без ModelSerializer (api.fast_serializers).
+FAST_SERIALIZERS = env.bool('FAST_SERIALIZERS', default=True)
+# Похожие рецепты (recipes.similarity): размер списка, веса признаков и
+# длина списка рецептов, после которой ингредиент не ищет кандидатов.
+SIMILAR_RECIPES_COUNT = env.int('SIMILAR_RECIPES_COUNT', default=10)
+SIMILAR_RECIPES_WEIGHTS = {
+    'ingredients': 0.7,
+    'tags': 0.2,
+    'favorites': 0.1,
+}
+SIMILAR_RECIPES_MAX_POSTINGS = env.int(
+    'SIMILAR_RECIPES_MAX_POSTINGS', default=1000
+)
+# Лента подписок: авторы с большим числом подписчиков не копируют рецепты
+# в ленты, а подмешиваются при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = env.int('FEED_FANOUT_MAX_FOLLOWERS', default=5000)
+FEED_POPULAR_AUTHORS_TIMEOUT = env.int(
+    'FEED_POPULAR_AUTHORS_TIMEOUT', default=600
+)
+# Сколько последних рецептов автора добавить в ленту при подписке.
+FEED_FOLLOW_BACKFILL = env.int('FEED_FOLLOW_BACKFILL', default=50)
+# Популярные за последнее время рецепты (команда compute_trending): вес
+# добавления в избранное и в корзину, период полураспада и окно пересчета
+# в секундах, размер рейтинга и время кэширования ответа.
+TRENDING_WEIGHTS = {
+    'favorites': 1.0,
+    'shoppings': 0.5,
+}
+TRENDING_HALF_LIFE = env.int('TRENDING_HALF_LIFE', default=24 * 60 * 60)
+TRENDING_WINDOW = env.int('TRENDING_WINDOW', default=14 * 24 * 60 * 60)
+TRENDING_SIZE = env.int('TRENDING_SIZE', default=500)
+TRENDING_CACHE_TIMEOUT = env.int('TRENDING_CACHE_TIMEOUT', default=60)
+# Максимум рецептов в одном запросе массового изменения избранного
+# и корзины (add и remove вместе).
+BULK_RECIPES_MAX = env.int('BULK_RECIPES_MAX', default=500)
+# Асинхронные GET-представления для рецептов, тегов, ингредиентов и подписок
+# (api.async_views). Имеет смысл только при запуске через ASGI и требует
+# постоянных соединений с БД (CONN_MAX_AGE > 0): запросы выполняются
+# в потоках пула, и каждый поток держит свое соединение.
+ASYNC_READ_VIEWS = env.bool('ASYNC_READ_VIEWS', default=False)
+# Время жизни закэшированных ответов для анонимных пользователей.
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=300)
+
+# Замеры запросов к БД по эндпоинтам (api.middleware.QueryBudgetMiddleware).
+# Заголовок Server-Timing раскрывает клиентам число запросов и тайминги,
+# поэтому по умолчанию замеры включены только в режиме отладки.
+QUERY_INSTRUMENTATION = env.bool('QUERY_INSTRUMENTATION', default=DEBUG)
+# Сколько последних замеров хранить для каждого эндпоинта.
+QUERY_STATS_SAMPLES = env.int('QUERY_STATS_SAMPLES', default=1000)
+# Каталог для снимков статистики (команда query_report), пусто - не сохранять.
+QUERY_STATS_DIR = env.str('QUERY_STATS_DIR', default='')
+QUERY_STATS_FLUSH_INTERVAL = env.int('QUERY_STATS_FLUSH_INTERVAL', default=10)
+# Бюджеты эндпоинтов: число запросов и время в БД в миллисекундах.
+# Число запросов замерено для авторизованного пользователя; для list
+# и retrieve учтен запрос версий при условном запросе (If-None-Match).
+QUERY_BUDGETS = {
+    'RecipeViewSet.list': {'queries': 7},
+    'RecipeViewSet.retrieve': {'queries': 6},
+    'RecipeViewSet.similar': {'queries': 3},
+    'RecipeViewSet.feed': {'queries': 7},
+    'RecipeViewSet.trending': {'queries': 2},
+    'UserViewSet.subscriptions': {'queries': 4},
+    'RecipeViewSet.download_shopping_cart': {'queries': 3},
+}
+# Бросать исключение при превышении бюджета вместо записи в лог
+# (включено в тестах api, см. api.tests.base.enforce_budgets).
+QUERY_BUDGET_RAISE = env.bool('QUERY_BUDGET_RAISE', default=False)
+
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -123,6 +224,16 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
+    # Без установленного orjson работают как стандартные JSON-классы DRF.
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 DJOSER = {
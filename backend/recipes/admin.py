@@ -1,7 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
+
+from users.models import User
 
 from .models import (FavoriteList, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingList, Tag)
+                     ShoppingCartTotal, ShoppingList, SimilarRecipe, Tag)
+from .similarity import group_pairs
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -32,9 +36,28 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     save_on_top = True
 
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Счетчики и варианты изображения не редактируются в форме,
+        # и полный save() затер бы их параллельные изменения.
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if field.editable and not field.primary_key
+        ] + ['updated_at'])
+
+    def save_related(self, request, form, formsets, change):
+        old_amounts = ShoppingCartTotal.objects.recipe_amounts(form.instance)
+        super().save_related(request, form, formsets, change)
+        ShoppingCartTotal.objects.change_recipe(form.instance, old_amounts)
+        recipe_id = form.instance.pk
+        transaction.on_commit(
+            lambda: SimilarRecipe.objects.update_recipe(recipe_id)
+        )
+
     @admin.display(description='Количество в избранных')
     def added_in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -43,12 +66,36 @@ class RecipeAdmin(admin.ModelAdmin):
         ).prefetch_related('ingredients', 'tags')
 
 
-@admin.register(FavoriteList)
-class FavoriteListAdmin(admin.ModelAdmin):
+class UserRecipeAdmin(admin.ModelAdmin):
+    """Избранное и корзина покупок.
+
+    Записи добавляются и удаляются через менеджер модели, чтобы счетчики
+    рецептов, рейтинг популярных и суммарный список покупок оставались
+    согласованными. Изменять записи нельзя - только удалить и добавить.
+    """
+
     list_display = ('user', 'recipe')
     list_display_links = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
 
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            obj.save()
+            self.model.objects.recipes_added(obj.user, [obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        self.model.objects.remove_recipe(obj.user, obj.recipe_id)
+
+    def delete_queryset(self, request, queryset):
+        recipes = group_pairs(queryset.values_list('user_id', 'recipe_id'))
+        users = User.objects.in_bulk(recipes)
+        with transaction.atomic():
+            for user_id, recipe_ids in recipes.items():
+                self.model.objects.remove_recipes(users[user_id], recipe_ids)
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related(
@@ -56,14 +103,11 @@ class FavoriteListAdmin(admin.ModelAdmin):
         )
 
 
-@admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
-    list_display = ('user', 'recipe')
-    list_display_links = ('user', 'recipe',)
-    search_fields = ('user__username', 'recipe__name')
+@admin.register(FavoriteList)
+class FavoriteListAdmin(UserRecipeAdmin):
+    pass
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related(
-            'recipe', 'user',
-        )
+
+@admin.register(ShoppingList)
+class ShoppingListAdmin(UserRecipeAdmin):
+    pass
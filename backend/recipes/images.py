@@ -0,0 +1,137 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'media/variants'
+
+
+def variant_name(source, variant):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'{VARIANTS_DIR}/{stem}_{variant}.webp'
+
+
+def encode_variant(image, size):
+    """Уменьшенная копия изображения в формате WebP."""
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(
+        buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4
+    )
+    return buffer.getvalue()
+
+
+def generate_variants(source, storage=default_storage):
+    """Создает варианты из `IMAGE_VARIANTS` и возвращает их имена."""
+    with storage.open(source, 'rb') as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info
+            or image.mode in ('LA', 'PA') else 'RGB'
+        )
+    variants = {'source': source}
+    for variant, size in settings.IMAGE_VARIANTS.items():
+        name = variant_name(source, variant)
+        if storage.exists(name):
+            storage.delete(name)
+        variants[variant] = storage.save(
+            name, ContentFile(encode_variant(image, size))
+        )
+    return variants
+
+
+def delete_variants(variants, keep=(), storage=default_storage):
+    """Удаляет файлы вариантов, кроме исходного изображения и `keep`."""
+    for variant, name in variants.items():
+        if variant != 'source' and name not in keep:
+            storage.delete(name)
+
+
+def process_recipe_image(recipe_id):
+    """Создает варианты изображения рецепта и сохраняет их имена.
+
+    Если за время обработки изображение рецепта заменили, результат
+    отбрасывается: новую обработку уже запланировал сигнал. Файлы
+    прежних вариантов удаляются после фиксации транзакции.
+    """
+    from .models import Recipe
+
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return None
+    variants = generate_variants(recipe.image.name)
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update().filter(
+            pk=recipe_id, image=variants['source']
+        ).first()
+        if recipe is None:
+            return None
+        previous = recipe.image_variants or {}
+        recipe.image_variants = variants
+        recipe.save(update_fields=('image_variants', 'updated_at'))
+        transaction.on_commit(lambda: delete_variants(
+            previous, keep=set(variants.values())
+        ))
+    return variants
+
+
+class ImagePipeline:
+    """Обработка изображений в пуле потоков вне запроса.
+
+    При `IMAGE_WORKERS = 0` изображения обрабатываются сразу, в том же
+    потоке (удобно для команд и отладки).
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='images'
+            )
+        return self._executor
+
+    def run(self, recipe_id):
+        try:
+            return process_recipe_image(recipe_id)
+        except Exception:
+            logger.exception('Image processing failed for recipe %s',
+                             recipe_id)
+        finally:
+            if self.workers:
+                connection.close()
+
+    def schedule(self, recipe_id):
+        """Ставит обработку в очередь после фиксации транзакции."""
+        if not self.workers:
+            transaction.on_commit(lambda: self.run(recipe_id))
+            return
+        transaction.on_commit(
+            lambda: self.executor.submit(self.run, recipe_id)
+        )
+
+
+image_pipeline = ImagePipeline(settings.IMAGE_WORKERS)
+
+
+def get_variant(recipe, variant):
+    """Имя варианта изображения или None, если он еще не готов."""
+    variants = recipe.image_variants or {}
+    if variants.get('source') != recipe.image.name:
+        return None
+    return variants.get(variant)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import TrendingRecipe
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending recipes ranking, run it periodically"
+
+    def handle(self, *args, **options):
+        count = TrendingRecipe.objects.rebuild()
+        self.stdout.write(
+            f'[!] Trending recipes have been recomputed: {count} recipes.'
+        )
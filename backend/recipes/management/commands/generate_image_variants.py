@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from progress.counter import Counter
+
+from recipes.images import get_variant, process_recipe_image
+from recipes.models import Recipe
+
+
+def process(recipe_id):
+    try:
+        return process_recipe_image(recipe_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP variants for existing recipe images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that already exist',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of threads processing images',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        ).order_by('id')
+        recipe_ids = [
+            recipe.pk for recipe in recipes.iterator()
+            if options['force'] or get_variant(recipe, 'source') is None
+        ]
+        counter = Counter('Images processed: ')
+        errors = 0
+        with ThreadPoolExecutor(max(options['workers'], 1)) as executor:
+            futures = [
+                executor.submit(process, recipe_id) for recipe_id in recipe_ids
+            ]
+            for recipe_id, future in zip(recipe_ids, futures):
+                try:
+                    future.result()
+                except Exception as error:
+                    errors += 1
+                    self.stderr.write(f'\nrecipe={recipe_id}: {error}')
+                counter.next()
+        counter.finish()
+        self.stdout.write(
+            f'[!] Image variants generated for '
+            f'{len(recipe_ids) - errors} recipes, {errors} errors.'
+        )
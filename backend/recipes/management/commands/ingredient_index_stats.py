@@ -0,0 +1,53 @@
+import random
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.search import in_memory_search
+
+
+def deep_sizeof(keys, entries):
+    size = sys.getsizeof(keys) + sys.getsizeof(entries)
+    for entry in entries:
+        size += sys.getsizeof(entry) + sum(map(sys.getsizeof, entry))
+    return size
+
+
+class Command(BaseCommand):
+    help = "Show memory and latency of the in-memory ingredient index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=10000,
+            help='Number of random prefix queries to measure',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        in_memory_search.invalidate()
+        keys, entries = in_memory_search.get_index()
+        build_time = time.perf_counter() - started
+        self.stdout.write(f'Entries: {len(entries)}')
+        self.stdout.write(f'Build time: {build_time * 1000:.1f} ms')
+        self.stdout.write(
+            f'Memory: {deep_sizeof(keys, entries) / 1024:.1f} KiB'
+        )
+        if not keys:
+            return
+
+        timings = []
+        for _ in range(options['queries']):
+            key = random.choice(keys)
+            query = key[:random.randint(1, min(len(key), 4))]
+            started = time.perf_counter()
+            in_memory_search.autocomplete(query)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        for percentile in (50, 90, 99):
+            index = min(len(timings) - 1, len(timings) * percentile // 100)
+            self.stdout.write(
+                f'p{percentile}: {timings[index] * 1000:.3f} ms'
+            )
@@ -1,33 +1,146 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from progress.bar import IncrementalBar
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from progress.counter import Counter
 
 from recipes.models import Ingredient
 
+FORMATS = ('csv', 'json')
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1]
-    )
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        for row in csv.reader(file):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        for item in json.load(file):
+            yield item['name'], item['measurement_unit']
+
+
+def batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class PostgresLoader:
+    """COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.table = Ingredient._meta.db_table
+        self.cursor.execute(
+            'CREATE TEMPORARY TABLE ingredient_staging '
+            '(name varchar(200), measurement_unit varchar(200)) '
+            'ON COMMIT DROP'
+        )
+
+    def load(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        self.cursor.copy_expert(
+            'COPY ingredient_staging (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+    def finish(self):
+        self.cursor.execute(
+            f'INSERT INTO {self.table} (name, measurement_unit) '
+            'SELECT DISTINCT name, measurement_unit FROM ingredient_staging '
+            'ON CONFLICT ON CONSTRAINT uq_name_measurement_unit DO NOTHING'
+        )
+
+
+class BulkCreateLoader:
+    """bulk_create с ignore_conflicts для остальных СУБД."""
+
+    def __init__(self, cursor):
+        pass
+
+    def load(self, batch):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in batch
+            ],
+            batch_size=len(batch),
+            ignore_conflicts=True
+        )
+
+    def finish(self):
+        pass
 
 
 class Command(BaseCommand):
     help = "Load ingredients to DB"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data/ingredients.csv'),
+            help='CSV (name,measurement_unit) or JSON file to load',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Input format, detected by file extension by default',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows sent to the database at once',
+        )
+
     def handle(self, *args, **options):
-        path = os.path.join(settings.BASE_DIR, 'data/ingredients.csv')
-        with open(path, 'r', encoding='utf-8') as file:
-            row_count = sum(1 for row in file)
-        with open(path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            bar = IncrementalBar('ingredients.csv'.ljust(17), max=row_count)
-            next(reader)
-            for row in reader:
-                bar.next()
-                ingredient_create(row)
-            bar.finish()
-        self.stdout.write('[!] The ingredients has been loaded successfully.')
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if file_format not in FORMATS:
+            raise CommandError(f'Unsupported file format: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        rows = read_csv(path) if file_format == 'csv' else read_json(path)
+        loader_class = (
+            PostgresLoader if connection.vendor == 'postgresql'
+            else BulkCreateLoader
+        )
+
+        started = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        counter = Counter(os.path.basename(path).ljust(17))
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            loader = loader_class(cursor)
+            for batch in batches(rows, options['batch_size']):
+                loader.load(batch)
+                total += len(batch)
+                counter.next(len(batch))
+            loader.finish()
+        counter.finish()
+        created = Ingredient.objects.count() - count_before
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'[!] The ingredients has been loaded successfully: '
+            f'{total} rows read, {created} created in {elapsed:.2f}s '
+            f'({total / elapsed:.0f} rows/sec).'
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify aggregated shopping cart totals"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare stored totals with the shopping carts',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            count = ShoppingCartTotal.objects.rebuild()
+            self.stdout.write(
+                f'[!] Shopping cart totals have been rebuilt: {count} rows.'
+            )
+            return
+        expected = ShoppingCartTotal.objects.calculate()
+        stored = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in ShoppingCartTotal.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            )
+        }
+        mismatches = [
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        ]
+        for user_id, ingredient_id in mismatches:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'stored={stored.get((user_id, ingredient_id))} '
+                f'expected={expected.get((user_id, ingredient_id))}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'{len(mismatches)} shopping cart totals are out of date.'
+            )
+        self.stdout.write('[!] Shopping cart totals are consistent.')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import SimilarRecipe
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed similar recipes index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipe',
+            type=int,
+            help='Only update neighbours of the recipe with this id',
+        )
+
+    def handle(self, *args, **options):
+        if options['recipe'] is not None:
+            SimilarRecipe.objects.update_recipe(options['recipe'])
+            self.stdout.write(
+                f'[!] Similar recipes updated for recipe {options["recipe"]}.'
+            )
+            return
+        count = SimilarRecipe.objects.rebuild()
+        self.stdout.write(
+            f'[!] Similar recipes index has been rebuilt: {count} rows.'
+        )
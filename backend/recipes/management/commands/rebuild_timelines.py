@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Rebuild subscription feed timelines from current subscriptions"
+
+    def handle(self, *args, **options):
+        count = TimelineEntry.objects.rebuild()
+        self.stdout.write(
+            f'[!] Timelines have been rebuilt for {count} subscriptions.'
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Recount favorites_count and shopping_count of recipes"
+
+    def handle(self, *args, **options):
+        count = Recipe.objects.reconcile_counters()
+        self.stdout.write(f'[!] Recipe counters fixed: {count} recipes.')
@@ -0,0 +1,334 @@
+from django.db import models, transaction
+from django.db.models import (BooleanField, Case, Count, Exists, F, OuterRef,
+                              Subquery, Sum, Value, When)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest
+
+from users.managers import UserRelationManager
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Кверисет рецептов с флагами текущего пользователя."""
+
+    def with_user_flags(self, user):
+        """Аннотирует `is_favorited` и `is_in_shopping_cart` одним запросом."""
+        from .models import FavoriteList, ShoppingList
+
+        if user is None or not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
+
+    def increment(self, field, delta=1):
+        """Меняет счетчик на `delta` одним UPDATE, не опуская ниже нуля."""
+        return self.update(**{field: Greatest(F(field) + delta, 0)})
+
+    def reconcile_counters(self):
+        """Сверяет `favorites_count` и `shopping_count` с таблицами.
+
+        Возвращает число исправленных рецептов.
+        """
+        from .models import FavoriteList, ShoppingList
+
+        actual = {
+            'favorites_count': FavoriteList.objects,
+            'shopping_count': ShoppingList.objects,
+        }
+        actual = {
+            field: Coalesce(Subquery(
+                manager.filter(recipe=OuterRef('pk')).values(
+                    'recipe'
+                ).annotate(total=Count('id')).values('total')
+            ), 0)
+            for field, manager in actual.items()
+        }
+        stale_ids = list(self.annotate(
+            **{f'actual_{field}': value for field, value in actual.items()}
+        ).exclude(
+            favorites_count=F('actual_favorites_count'),
+            shopping_count=F('actual_shopping_count')
+        ).values_list('pk', flat=True))
+        if stale_ids:
+            self.filter(pk__in=stale_ids).update(**actual)
+        return len(stale_ids)
+
+    def latest_per_author(self, author_ids, limit):
+        """Не более `limit` последних рецептов каждого из авторов."""
+        if not author_ids:
+            return self.none()
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return self.filter(pk__in=RawSQL(
+            'SELECT id FROM ('
+            '    SELECT id, ROW_NUMBER() OVER ('
+            '        PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            '    ) AS rn'
+            f'    FROM {self.model._meta.db_table}'
+            f'    WHERE author_id IN ({placeholders})'
+            ') AS numbered WHERE rn <= %s',
+            (*author_ids, limit)
+        ))
+
+
+class UserRecipeManager(UserRelationManager):
+    """Добавление и удаление рецептов пользователя.
+
+    Счетчики рецептов и рейтинг популярных обновляются в той же
+    транзакции, что и запись, и только для действительно вставленных
+    или удаленных строк. При массовых изменениях новые записи
+    вставляются одним INSERT, лишние удаляются одним DELETE,
+    а для каждого рецепта возвращается статус.
+
+    Записи создаются и удаляются только через менеджер: `save()`
+    и `delete()` в обход него не обновляют счетчики. Админка и удаление
+    пользователя (recipes.signals) тоже используют менеджер, а расхождения
+    исправляют команды reconcile_recipe_counters и rebuild_shopping_totals.
+    """
+
+    CREATED = 'created'
+    EXISTS = 'exists'
+    DELETED = 'deleted'
+    NOT_FOUND = 'not_found'
+
+    counter_field = None
+    trending_source = None
+
+    def __init__(self):
+        super().__init__('recipe')
+
+    def add_recipe(self, user, recipe_id):
+        """Добавляет рецепт, возвращает False, если он уже добавлен."""
+        with transaction.atomic():
+            created = self.add(user, recipe_id)
+            if created:
+                self.recipes_added(user, [recipe_id])
+        return created
+
+    def remove_recipe(self, user, recipe_id):
+        """Удаляет рецепт, возвращает False, если его не было."""
+        statuses = self.remove_recipes(user, [recipe_id])
+        return self.DELETED in statuses.values()
+
+    def add_recipes(self, user, recipe_ids):
+        """Добавляет рецепты, возвращает {recipe_id: статус}."""
+        from .models import Recipe
+
+        recipe_ids = self.unique_ids(recipe_ids)
+        with transaction.atomic():
+            found = set(Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', flat=True))
+            created = self.add_many(
+                user, [pk for pk in recipe_ids if pk in found]
+            )
+            self.recipes_added(user, created)
+        created = set(created)
+        return {
+            pk: (
+                self.NOT_FOUND if pk not in found
+                else self.CREATED if pk in created
+                else self.EXISTS
+            )
+            for pk in recipe_ids
+        }
+
+    def remove_recipes(self, user, recipe_ids):
+        """Удаляет рецепты, возвращает {recipe_id: статус}."""
+        recipe_ids = self.unique_ids(recipe_ids)
+        with transaction.atomic():
+            deleted = dict(self.select_for_update().filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'created_at'))
+            if deleted:
+                self.filter(user=user, recipe_id__in=deleted).delete()
+            self.recipes_removed(user, deleted)
+        return {
+            pk: self.DELETED if pk in deleted else self.NOT_FOUND
+            for pk in recipe_ids
+        }
+
+    def recipes_added(self, user, recipe_ids):
+        from .models import Recipe, TrendingRecipe
+
+        if not recipe_ids:
+            return
+        Recipe.objects.filter(pk__in=recipe_ids).increment(self.counter_field)
+        TrendingRecipe.objects.record_many(self.trending_source, recipe_ids)
+
+    def recipes_removed(self, user, additions):
+        """`additions` - {recipe_id: created_at} удаленных записей."""
+        from .models import Recipe, TrendingRecipe
+
+        if not additions:
+            return
+        Recipe.objects.filter(pk__in=additions).increment(
+            self.counter_field, -1
+        )
+        TrendingRecipe.objects.discard_many(self.trending_source, additions)
+
+
+class FavoriteListManager(UserRecipeManager):
+    counter_field = 'favorites_count'
+    trending_source = 'favorites'
+
+
+class ShoppingListManager(UserRecipeManager):
+    counter_field = 'shopping_count'
+    trending_source = 'shoppings'
+
+    def recipes_added(self, user, recipe_ids):
+        from .models import ShoppingCartTotal
+
+        super().recipes_added(user, recipe_ids)
+        ShoppingCartTotal.objects.add_recipes(user, recipe_ids)
+
+    def recipes_removed(self, user, additions):
+        from .models import ShoppingCartTotal
+
+        super().recipes_removed(user, additions)
+        ShoppingCartTotal.objects.remove_recipes(user, list(additions))
+
+
+class ShoppingCartTotalManager(models.Manager):
+    """Инкрементальное обновление суммарного списка покупок."""
+
+    @staticmethod
+    def recipe_amounts(recipe):
+        """Количество каждого ингредиента в рецепте."""
+        return ShoppingCartTotalManager.recipes_amounts([recipe])
+
+    @staticmethod
+    def recipes_amounts(recipes):
+        """Суммарное количество каждого ингредиента в рецептах."""
+        from .models import RecipeIngredient
+
+        return dict(
+            RecipeIngredient.objects.filter(
+                recipe__in=recipes
+            ).values('ingredient_id').annotate(
+                total=Sum('amount')
+            ).values_list('ingredient_id', 'total').order_by()
+        )
+
+    def apply(self, user_ids, deltas):
+        """Прибавляет `deltas` {ingredient_id: amount} к корзинам."""
+        user_ids = list(user_ids)
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        if not user_ids or not deltas:
+            return
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=0
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ],
+            ignore_conflicts=True
+        )
+        self.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        ).update(total_amount=F('total_amount') + Case(
+            *[When(ingredient_id=ingredient_id, then=Value(delta))
+              for ingredient_id, delta in deltas.items()],
+            default=Value(0)
+        ))
+        self.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas,
+            total_amount__lte=0
+        ).delete()
+
+    def add_recipes(self, user, recipes):
+        if recipes:
+            self.apply([user.pk], self.recipes_amounts(recipes))
+
+    def remove_recipes(self, user, recipes):
+        if recipes:
+            self.apply([user.pk], {
+                ingredient_id: -amount
+                for ingredient_id, amount
+                in self.recipes_amounts(recipes).items()
+            })
+
+    def discard_recipe(self, recipe):
+        """Убирает ингредиенты удаляемого рецепта из всех корзин."""
+        from .models import ShoppingList
+
+        self.apply(
+            ShoppingList.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True),
+            {
+                ingredient_id: -amount
+                for ingredient_id, amount
+                in self.recipe_amounts(recipe).items()
+            }
+        )
+
+    def change_recipe(self, recipe, old_amounts):
+        """Учитывает изменение ингредиентов рецепта во всех корзинах."""
+        from .models import ShoppingList
+
+        new_amounts = self.recipe_amounts(recipe)
+        deltas = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in new_amounts.keys() | old_amounts.keys()
+        }
+        self.apply(
+            ShoppingList.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True),
+            deltas
+        )
+
+    @staticmethod
+    def calculate(users=None):
+        """Суммы ингредиентов, посчитанные по таблице корзины."""
+        from .models import RecipeIngredient
+
+        if users is None:
+            queryset = RecipeIngredient.objects.filter(
+                recipe__shoppings__isnull=False
+            )
+        else:
+            queryset = RecipeIngredient.objects.filter(
+                recipe__shoppings__user__in=users
+            )
+        return {
+            (row['recipe__shoppings__user'], row['ingredient']): row['total']
+            for row in queryset.values(
+                'recipe__shoppings__user', 'ingredient'
+            ).annotate(total=Sum('amount')).order_by()
+        }
+
+    def rebuild(self, users=None):
+        """Пересчитывает таблицу целиком или для указанных пользователей."""
+        totals = self.calculate(users)
+        stale = self.all() if users is None else self.filter(user__in=users)
+        stale.delete()
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=total
+                )
+                for (user_id, ingredient_id), total in totals.items()
+            ],
+            batch_size=1000
+        )
+        return len(totals)
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:39
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_created_at(apps, schema_editor):
+    # Время добавления старых записей неизвестно, берем дату публикации
+    # рецепта, чтобы они не попали в рейтинг как только что добавленные.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model_name in ('FavoriteList', 'ShoppingList'):
+        apps.get_model('recipes', model_name).objects.update(
+            created_at=Subquery(
+                Recipe.objects.filter(pk=OuterRef('recipe')).values(
+                    'pub_date'
+                )
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingRecipe',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('epoch', models.FloatField(verbose_name='Начало отсчета оценки')),
+            ],
+            options={
+                'verbose_name': 'Популярный рецепт',
+                'verbose_name_plural': 'Популярные рецепты',
+                'ordering': ('-score',),
+            },
+        ),
+        migrations.AddField(
+            model_name='favoritelist',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='trendingrecipe',
+            index=models.Index(fields=['-score'], name='trending_score_idx'),
+        ),
+        migrations.RunPython(fill_created_at, migrations.RunPython.noop),
+    ]
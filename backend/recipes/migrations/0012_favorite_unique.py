@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicate_favorites(apps, schema_editor):
+    """Оставляет по одной записи избранного и исправляет счетчики."""
+    FavoriteList = apps.get_model('recipes', 'FavoriteList')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    duplicates = FavoriteList.objects.values('user', 'recipe').annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+    for row in duplicates:
+        FavoriteList.objects.filter(
+            user=row['user'], recipe=row['recipe']
+        ).exclude(id=row['keep_id']).delete()
+        Recipe.objects.filter(
+            pk=row['recipe'], favorites_count__gte=row['total'] - 1
+        ).update(favorites_count=F('favorites_count') - (row['total'] - 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_trending'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_favorites, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='favoritelist',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'recipe'), name='uq_favorite_user_recipe'
+            ),
+        ),
+    ]
@@ -4,6 +4,12 @@ from django.db import models
 
 from users.models import User
 
+from .managers import (FavoriteListManager, RecipeQuerySet,
+                       ShoppingCartTotalManager, ShoppingListManager)
+from .similarity import SimilarRecipeManager
+from .timeline import TimelineEntryManager
+from .trending import TrendingRecipeManager
+
 
 class Tag(models.Model):
     """Модель тега."""
@@ -115,14 +121,37 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
     image = models.ImageField(
         upload_to='media/',
         help_text='Прикрепите изображение',
         verbose_name='Изображение рецепта'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество в избранном'
+    )
+    shopping_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество в корзинах'
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         constraints = [
@@ -131,6 +160,20 @@ class Recipe(models.Model):
                 name='uq_text_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popular_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -188,10 +231,23 @@ class FavoriteList(models.Model):
         related_name='favorites',
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
+
+    objects = FavoriteListManager()
 
     class Meta:
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='uq_favorite_user_recipe'
+            ),
+        ]
 
     def __str__(self):
         return f'Рецепты из избранных {self.user}'
@@ -212,6 +268,13 @@ class ShoppingList(models.Model):
         related_name='shoppings',
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
+
+    objects = ShoppingListManager()
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -225,3 +288,155 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'Рецепты из корзины покупок {self.user}'
+
+
+class ShoppingCartTotal(models.Model):
+    """Суммарное количество ингредиентов в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_totals',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_totals',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField(
+        default=0,
+        verbose_name='Общее количество'
+    )
+
+    objects = ShoppingCartTotalManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='uq_user_ingredient'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} {self.total_amount}'
+
+
+class SimilarRecipe(models.Model):
+    """Рецепт из списка похожих и оценка похожести."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Оценка похожести')
+
+    objects = SimilarRecipeManager()
+
+    class Meta:
+        ordering = ('-score', 'similar')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='uq_recipe_similar'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}: {self.score:.3f}'
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписчика автора."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    objects = TimelineEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='uq_timeline_user_recipe'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class TrendingRecipe(models.Model):
+    """Оценка рецепта в рейтинге популярных за последнее время."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+    epoch = models.FloatField(verbose_name='Начало отсчета оценки')
+
+    objects = TrendingRecipeManager()
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.score:.3f}'
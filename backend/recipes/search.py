@@ -0,0 +1,109 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Ingredient
+
+
+class PostgresIngredientSearch:
+    """Поиск по `UPPER(name)` с триграммным GIN-индексом.
+
+    Совпадения с начала названия выводятся раньше совпадений в середине.
+    """
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            name__icontains=query
+        ).annotate(
+            rank=Case(
+                When(name__istartswith=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('rank', 'name')
+
+
+class InMemoryIngredientSearch:
+    """Индекс ингредиентов в памяти процесса.
+
+    Хранит отсортированный массив названий в нижнем регистре: совпадения
+    с начала названия ищутся бинарным поиском, остальные - проходом по
+    массиву. Индекс сбрасывается сигналами `Ingredient` и перестраивается
+    не реже раза в `INGREDIENT_INDEX_TTL` секунд, чтобы подхватывать
+    изменения из других процессов.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._keys = None
+        self._entries = None
+        self._built_at = None
+        self._lock = Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._entries = None
+
+    def build(self):
+        entries = sorted(
+            (name.casefold(), name, pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            )
+        )
+        keys = [entry[0] for entry in entries]
+        return keys, entries
+
+    def get_index(self):
+        with self._lock:
+            expired = (
+                self.ttl is not None and self._built_at is not None
+                and time.monotonic() - self._built_at > self.ttl
+            )
+            if self._keys is None or expired:
+                self._keys, self._entries = self.build()
+                self._built_at = time.monotonic()
+            return self._keys, self._entries
+
+    def match(self, query):
+        """Записи, подходящие под запрос: сначала совпадения с начала."""
+        query = query.casefold()
+        keys, entries = self.get_index()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', start)
+        return entries[start:end] + [
+            entry for entry in entries[:start] + entries[end:]
+            if query in entry[0]
+        ]
+
+    def autocomplete(self, query):
+        """Результат в формате `IngredientSerializer` без запросов к БД."""
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, name, pk, measurement_unit in self.match(query)
+        ]
+
+    def search(self, queryset, query):
+        ids = [pk for _, _, pk, _ in self.match(query)]
+        return queryset.filter(pk__in=ids).order_by(
+            Case(
+                *[When(pk=pk, then=Value(position))
+                  for position, pk in enumerate(ids)],
+                output_field=IntegerField()
+            )
+        )
+
+
+postgres_search = PostgresIngredientSearch()
+in_memory_search = InMemoryIngredientSearch(settings.INGREDIENT_INDEX_TTL)
+
+
+def get_ingredient_search():
+    if connection.vendor == 'postgresql':
+        return postgres_search
+    return in_memory_search
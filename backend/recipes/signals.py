@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import Subscribe, User
+
+from .images import image_pipeline
+from .models import (FavoriteList, Ingredient, Recipe, ShoppingCartTotal,
+                     ShoppingList, TimelineEntry)
+from .search import in_memory_search
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_totals(sender, instance, **kwargs):
+    ShoppingCartTotal.objects.discard_recipe(instance)
+
+
+@receiver(pre_delete, sender=User)
+def remove_user_recipes(sender, instance, **kwargs):
+    # Каскадное удаление избранного и корзины не обновило бы счетчики
+    # рецептов и рейтинг популярных.
+    for model in (FavoriteList, ShoppingList):
+        model.objects.remove_recipes(instance, list(
+            model.objects.filter(user=instance).values_list(
+                'recipe_id', flat=True
+            )
+        ))
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    variants = instance.image_variants or {}
+    if raw or not instance.image or (
+        variants.get('source') == instance.image.name
+    ):
+        return
+    image_pipeline.schedule(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_search(sender, **kwargs):
+    in_memory_search.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: TimelineEntry.objects.fan_out(instance))
+
+
+@receiver(post_save, sender=Subscribe)
+def add_author_to_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        TimelineEntry.objects.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def remove_author_from_timeline(sender, instance, **kwargs):
+    TimelineEntry.objects.unfollow(instance.user_id, instance.author_id)
@@ -0,0 +1,236 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+
+
+def idf(total, df):
+    """Сглаженная обратная частота: редкие ингредиенты весят больше."""
+    return math.log((1 + total) / (1 + df)) + 1
+
+
+class SimilarityIndex:
+    """Похожесть рецептов по ингредиентам, тегам и общим поклонникам.
+
+    Ингредиенты и теги сравниваются взвешенным коэффициентом Жаккара
+    с весами IDF, поклонники (добавившие рецепт в избранное) -
+    косинусной мерой. Итог - взвешенная сумма из `SIMILAR_RECIPES_WEIGHTS`.
+
+    Кандидаты ищутся по инвертированным спискам ингредиентов и
+    поклонников, поэтому сравниваются только рецепты с общими
+    признаками. Ингредиенты длиннее `max_postings` (соль, вода)
+    кандидатов не порождают, но учитываются в оценке.
+    """
+
+    def __init__(self, total, ingredients, tags, fans, ingredient_df, tag_df,
+                 weights, max_postings):
+        self.ingredients = ingredients
+        self.tags = tags
+        self.fans = fans
+        self.weights = weights
+        self.max_postings = max_postings
+        self.ingredient_weights = {
+            pk: idf(total, df) for pk, df in ingredient_df.items()
+        }
+        self.tag_weights = {pk: idf(total, df) for pk, df in tag_df.items()}
+        self.postings = defaultdict(set)
+        for recipe_id, ingredient_ids in ingredients.items():
+            for ingredient_id in ingredient_ids:
+                self.postings[('ingredient', ingredient_id)].add(recipe_id)
+        for recipe_id, user_ids in fans.items():
+            for user_id in user_ids:
+                self.postings[('user', user_id)].add(recipe_id)
+
+    @staticmethod
+    def jaccard(first, second, weights):
+        common = first & second
+        if not common:
+            return 0.0
+        intersection = sum(weights.get(pk, 1) for pk in common)
+        union = sum(weights.get(pk, 1) for pk in first | second)
+        return intersection / union
+
+    @staticmethod
+    def cosine(first, second):
+        if not first or not second:
+            return 0.0
+        return len(first & second) / math.sqrt(len(first) * len(second))
+
+    def score(self, first, second):
+        empty = frozenset()
+        return (
+            self.weights['ingredients'] * self.jaccard(
+                self.ingredients.get(first, empty),
+                self.ingredients.get(second, empty),
+                self.ingredient_weights
+            )
+            + self.weights['tags'] * self.jaccard(
+                self.tags.get(first, empty),
+                self.tags.get(second, empty),
+                self.tag_weights
+            )
+            + self.weights['favorites'] * self.cosine(
+                self.fans.get(first, empty), self.fans.get(second, empty)
+            )
+        )
+
+    def candidates(self, recipe_id):
+        keys = [
+            ('ingredient', pk) for pk in self.ingredients.get(recipe_id, ())
+        ] + [('user', pk) for pk in self.fans.get(recipe_id, ())]
+        result = set()
+        for key in keys:
+            posting = self.postings.get(key, ())
+            if len(posting) <= self.max_postings:
+                result |= posting
+        result.discard(recipe_id)
+        return result
+
+    def scores(self, recipe_id):
+        """Оценки всех кандидатов {recipe_id: score}, больше нуля."""
+        scores = {
+            candidate: self.score(recipe_id, candidate)
+            for candidate in self.candidates(recipe_id)
+        }
+        return {pk: score for pk, score in scores.items() if score > 0}
+
+    def neighbours(self, recipe_id, count):
+        """`count` самых похожих рецептов: список (recipe_id, score)."""
+        return heapq.nlargest(
+            count, self.scores(recipe_id).items(),
+            key=lambda item: (item[1], -item[0])
+        )
+
+
+def group_pairs(pairs):
+    groups = defaultdict(set)
+    for key, value in pairs:
+        groups[key].add(value)
+    return {key: frozenset(values) for key, values in groups.items()}
+
+
+class SimilarRecipeManager(models.Manager):
+    """Предрассчитанные списки похожих рецептов."""
+
+    @staticmethod
+    def load_index(recipe_ids=None):
+        """SimilarityIndex по всем рецептам или только по `recipe_ids`."""
+        from .models import FavoriteList, Recipe, RecipeIngredient
+
+        recipe_ingredients = RecipeIngredient.objects.all()
+        recipe_tags = Recipe.tags.through.objects.all()
+        favorites = FavoriteList.objects.all()
+        if recipe_ids is not None:
+            recipe_ingredients = recipe_ingredients.filter(
+                recipe_id__in=recipe_ids
+            )
+            recipe_tags = recipe_tags.filter(recipe_id__in=recipe_ids)
+            favorites = favorites.filter(recipe_id__in=recipe_ids)
+        return SimilarityIndex(
+            total=Recipe.objects.count(),
+            ingredients=group_pairs(
+                recipe_ingredients.values_list('recipe_id', 'ingredient_id')
+            ),
+            tags=group_pairs(recipe_tags.values_list('recipe_id', 'tag_id')),
+            fans=group_pairs(favorites.values_list('recipe_id', 'user_id')),
+            ingredient_df=dict(
+                RecipeIngredient.objects.values('ingredient_id').annotate(
+                    df=Count('recipe_id', distinct=True)
+                ).values_list('ingredient_id', 'df').order_by()
+            ),
+            tag_df=dict(
+                Recipe.tags.through.objects.values('tag_id').annotate(
+                    df=Count('recipe_id', distinct=True)
+                ).values_list('tag_id', 'df').order_by()
+            ),
+            weights=settings.SIMILAR_RECIPES_WEIGHTS,
+            max_postings=settings.SIMILAR_RECIPES_MAX_POSTINGS,
+        )
+
+    @transaction.atomic
+    def rebuild(self):
+        """Пересчитывает похожие рецепты для всех рецептов."""
+        index = self.load_index()
+        rows = [
+            self.model(recipe_id=recipe_id, similar_id=similar_id, score=score)
+            for recipe_id in index.ingredients.keys() | index.fans.keys()
+            for similar_id, score in index.neighbours(
+                recipe_id, settings.SIMILAR_RECIPES_COUNT
+            )
+        ]
+        self.all().delete()
+        self.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+    @transaction.atomic
+    def update_recipe(self, recipe_id):
+        """Обновляет похожие рецепты после изменения одного рецепта.
+
+        Пересчитывается список самого рецепта, а в списки кандидатов
+        он добавляется с новой оценкой. Если рецепт выпал из чужого
+        списка, освободившееся место заполнит следующий `rebuild`.
+        """
+        from .models import FavoriteList, RecipeIngredient
+
+        max_postings = settings.SIMILAR_RECIPES_MAX_POSTINGS
+        ingredient_ids = RecipeIngredient.objects.filter(
+            ingredient_id__in=RecipeIngredient.objects.filter(
+                recipe_id=recipe_id
+            ).values('ingredient_id')
+        ).values('ingredient_id').annotate(
+            df=Count('recipe_id', distinct=True)
+        ).filter(df__lte=max_postings).values('ingredient_id')
+        fan_ids = FavoriteList.objects.filter(
+            user_id__in=FavoriteList.objects.filter(
+                recipe_id=recipe_id
+            ).values('user_id')
+        ).values('user_id').annotate(
+            df=Count('recipe_id')
+        ).filter(df__lte=max_postings).values('user_id')
+        candidate_ids = set(RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values_list('recipe_id', flat=True)) | set(
+            FavoriteList.objects.filter(
+                user_id__in=fan_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        index = self.load_index(candidate_ids | {recipe_id})
+        count = settings.SIMILAR_RECIPES_COUNT
+        scores = index.scores(recipe_id)
+        self.filter(recipe_id=recipe_id).delete()
+        self.filter(similar_id=recipe_id).delete()
+        self.bulk_create(
+            [
+                self.model(
+                    recipe_id=recipe_id, similar_id=similar_id, score=score
+                )
+                for similar_id, score in index.neighbours(recipe_id, count)
+            ] + [
+                self.model(
+                    recipe_id=similar_id, similar_id=recipe_id, score=score
+                )
+                for similar_id, score in scores.items()
+            ]
+        )
+        self.trim(scores.keys(), count)
+
+    def trim(self, recipe_ids, count):
+        """Оставляет в списках рецептов не больше `count` записей."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        self.filter(pk__in=RawSQL(
+            'SELECT id FROM ('
+            '    SELECT id, ROW_NUMBER() OVER ('
+            '        PARTITION BY recipe_id ORDER BY score DESC, similar_id'
+            '    ) AS rn'
+            f'    FROM {self.model._meta.db_table}'
+            f'    WHERE recipe_id IN ({placeholders})'
+            ') AS ranked WHERE rn > %s',
+            (*recipe_ids, count)
+        )).delete()
@@ -0,0 +1,134 @@
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, Q
+
+from users.models import Subscribe
+
+
+class TimelineEntryManager(models.Manager):
+    """Ленты рецептов авторов, на которых подписан пользователь.
+
+    Рецепты авторов, у которых не больше `FEED_FANOUT_MAX_FOLLOWERS`
+    подписчиков, при публикации записываются в ленту каждого подписчика.
+    Рецепты популярных авторов в ленты не копируются и подмешиваются
+    при чтении.
+    """
+
+    POPULAR_AUTHORS_KEY = 'feed:popular_authors'
+
+    def popular_author_ids(self):
+        """Авторы с числом подписчиков больше порога, кэшируется."""
+        author_ids = cache.get(self.POPULAR_AUTHORS_KEY)
+        if author_ids is None:
+            author_ids = frozenset(
+                Subscribe.objects.values('author_id').annotate(
+                    followers=Count('id')
+                ).filter(
+                    followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+                ).values_list('author_id', flat=True).order_by()
+            )
+            cache.set(
+                self.POPULAR_AUTHORS_KEY, author_ids,
+                settings.FEED_POPULAR_AUTHORS_TIMEOUT
+            )
+        return author_ids
+
+    def fan_out(self, recipe):
+        """Записывает новый рецепт в ленты подписчиков автора."""
+        if recipe.author_id in self.popular_author_ids():
+            return
+        follower_ids = Subscribe.objects.filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True)
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, recipe_id=recipe.pk,
+                    author_id=recipe.author_id, pub_date=recipe.pub_date
+                )
+                for user_id in follower_ids.iterator()
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+    def follow(self, user_id, author_id):
+        """Добавляет в ленту последние рецепты нового автора."""
+        from .models import Recipe
+
+        if author_id in self.popular_author_ids():
+            return
+        recipes = Recipe.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date'
+        )[:settings.FEED_FOLLOW_BACKFILL]
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, recipe_id=recipe_id,
+                    author_id=author_id, pub_date=pub_date
+                )
+                for recipe_id, pub_date in recipes
+            ],
+            ignore_conflicts=True
+        )
+
+    def unfollow(self, user_id, author_id):
+        self.filter(user_id=user_id, author_id=author_id).delete()
+
+    @staticmethod
+    def before(queryset, cursor, date_field, id_field):
+        if cursor is None:
+            return queryset
+        pub_date, pk = cursor
+        return queryset.filter(
+            Q(**{f'{date_field}__lt': pub_date})
+            | Q(**{date_field: pub_date, f'{id_field}__lt': pk})
+        )
+
+    def feed(self, user, followed_ids, cursor=None, limit=10):
+        """Страница ленты: список (pub_date, recipe_id) новее `cursor`.
+
+        Записи ленты и рецепты популярных авторов читаются по индексам
+        в порядке (pub_date, id) и сливаются.
+        """
+        from .models import Recipe
+
+        entries = self.before(
+            self.filter(user=user), cursor, 'pub_date', 'recipe_id'
+        ).order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit]
+        popular_ids = self.popular_author_ids() & followed_ids
+        sources = [list(entries)]
+        if popular_ids:
+            sources.append(list(self.before(
+                Recipe.objects.filter(author_id__in=popular_ids),
+                cursor, 'pub_date', 'id'
+            ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[
+                :limit
+            ]))
+        page = []
+        for item in heapq.merge(*sources, reverse=True):
+            if page and page[-1] == item:
+                continue
+            page.append(item)
+            if len(page) == limit:
+                break
+        return page
+
+    @transaction.atomic
+    def rebuild(self):
+        """Пересобирает ленты по текущим подпискам."""
+        self.all().delete()
+        popular_ids = self.popular_author_ids()
+        subscriptions = Subscribe.objects.exclude(
+            author_id__in=popular_ids
+        ).values_list('user_id', 'author_id')
+        count = 0
+        for user_id, author_id in subscriptions.iterator():
+            self.follow(user_id, author_id)
+            count += 1
+        return count
@@ -0,0 +1,158 @@
+import heapq
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Greatest, Least, Power, TruncHour
+from django.utils import timezone
+
+
+class TrendingRecipeManager(models.Manager):
+    """Рейтинг рецептов по недавним добавлениям в избранное и корзину.
+
+    Каждое добавление весит `TRENDING_WEIGHTS[...]` и вдвое теряет вес
+    за `TRENDING_HALF_LIFE` секунд. Вместо затухания всех оценок
+    со временем хранится сумма `weight * 2 ** ((t - epoch) / half_life)`:
+    порядок рецептов тот же, а новое добавление просто прибавляется
+    к оценке. Как и в `rebuild`, время добавления округляется
+    до начала часа (UTC). `rebuild` пересчитывает таблицу и сдвигает epoch на
+    текущий момент, чтобы оценки не росли неограниченно; если команду
+    долго не запускали, epoch сдвигается при записи. Удаление из
+    избранного или корзины вычитает вклад добавления, так что оценка
+    совпадает с той, что посчитал бы `rebuild`. Таблица ограничена
+    `TRENDING_SIZE` рецептами с наибольшими оценками.
+    """
+
+    # Предел показателя степени в оценках: 2 ** 32 еще далеко
+    # от переполнения и сохраняет точность float.
+    MAX_EXPONENT = 32
+
+    @staticmethod
+    def hour(timestamp):
+        """Начало часа по UTC, как у TruncHour в `rebuild`."""
+        return timestamp - timestamp % 3600
+
+    def rebuild(self, now=None):
+        """Пересчитывает рейтинг по добавлениям за `TRENDING_WINDOW`."""
+        from .models import FavoriteList, ShoppingList
+
+        now = time.time() if now is None else now
+        since = datetime.fromtimestamp(
+            now - settings.TRENDING_WINDOW, tz=timezone.utc
+        )
+        scores = defaultdict(float)
+        for source, model in (('favorites', FavoriteList),
+                              ('shoppings', ShoppingList)):
+            weight = settings.TRENDING_WEIGHTS[source]
+            # Добавления суммируются по часам в БД, в Python попадает
+            # не больше одной строки на рецепт за каждый час окна.
+            buckets = model.objects.filter(created_at__gte=since).annotate(
+                hour=TruncHour('created_at', tzinfo=timezone.utc)
+            ).values('recipe_id', 'hour').annotate(
+                total=Count('id')
+            ).values_list('recipe_id', 'hour', 'total').order_by()
+            for recipe_id, hour, total in buckets:
+                scores[recipe_id] += total * weight * 2 ** (
+                    (hour.timestamp() - now) / settings.TRENDING_HALF_LIFE
+                )
+        top = heapq.nlargest(
+            settings.TRENDING_SIZE, scores.items(), key=lambda item: item[1]
+        )
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create([
+                self.model(recipe_id=recipe_id, score=score, epoch=now)
+                for recipe_id, score in top
+            ])
+        return len(top)
+
+    def decay(self, timestamp):
+        """`2 ** ((timestamp - epoch) / half_life)` для UPDATE оценок.
+
+        Показатель ограничен `MAX_EXPONENT`, чтобы Power не вызывал
+        переполнения в PostgreSQL, даже если epoch давно не сдвигался.
+        """
+        exponent = (timestamp - F('epoch')) / settings.TRENDING_HALF_LIFE
+        return Power(2, Least(
+            Greatest(exponent, -self.MAX_EXPONENT), self.MAX_EXPONENT
+        ))
+
+    def current_epoch(self, now):
+        """Epoch оценок, при необходимости сдвинутый на `now`.
+
+        Если epoch отстал больше чем на `MAX_EXPONENT` периодов
+        полураспада, оценки пересчитываются от `now`.
+        """
+        epoch = self.values_list('epoch', flat=True).first()
+        if epoch is None:
+            return now
+        if (now - epoch) / settings.TRENDING_HALF_LIFE > self.MAX_EXPONENT:
+            self.filter(epoch=epoch).update(
+                score=F('score') * 2 ** (
+                    (epoch - now) / settings.TRENDING_HALF_LIFE
+                ),
+                epoch=now
+            )
+            return now
+        return epoch
+
+    def record_many(self, source, recipe_ids):
+        """Прибавляет к оценке каждого из рецептов одно добавление."""
+        if not recipe_ids:
+            return
+        now = time.time()
+        epoch = self.current_epoch(now)
+        self.bulk_create(
+            [
+                self.model(recipe_id=recipe_id, score=0, epoch=epoch)
+                for recipe_id in recipe_ids
+            ],
+            ignore_conflicts=True
+        )
+        self.filter(recipe_id__in=recipe_ids).update(
+            score=F('score') + settings.TRENDING_WEIGHTS[source] * self.decay(
+                Value(self.hour(now), output_field=FloatField())
+            )
+        )
+        self.trim()
+
+    def trim(self):
+        """Удаляет рецепты за пределами `TRENDING_SIZE` лучших.
+
+        Строки, заблокированные параллельными транзакциями, пропускаются,
+        чтобы запись не ждала чужих блокировок: размер ограничен нестрого.
+        """
+        self.filter(recipe_id__in=self.select_for_update(
+            skip_locked=True
+        ).order_by('-score', 'recipe_id').values('recipe_id')[
+            settings.TRENDING_SIZE:
+        ]).delete()
+
+    def discard_many(self, source, additions):
+        """Вычитает из оценок удаленные добавления.
+
+        `additions` - {recipe_id: created_at}. Как и в `rebuild`,
+        учитываются только добавления за `TRENDING_WINDOW`.
+        """
+        since = time.time() - settings.TRENDING_WINDOW
+        additions = {
+            recipe_id: self.hour(created_at.timestamp())
+            for recipe_id, created_at in additions.items()
+            if created_at.timestamp() >= since
+        }
+        if not additions:
+            return
+        added_at = Case(
+            *[When(recipe_id=recipe_id, then=Value(timestamp))
+              for recipe_id, timestamp in additions.items()],
+            output_field=FloatField()
+        )
+        self.filter(recipe_id__in=additions).update(score=Greatest(
+            F('score') - settings.TRENDING_WEIGHTS[source] * self.decay(
+                added_at
+            ),
+            0
+        ))
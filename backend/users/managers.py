@@ -0,0 +1,80 @@
+from django.db import connections, models
+from django.db.models.signals import post_save
+from django.db.models.sql import InsertQuery
+
+
+class UserRelationManager(models.Manager):
+    """Идемпотентная запись связей пользователя: подписок, избранного, корзины.
+
+    Вместо проверки exists() перед вставкой выполняется
+    INSERT ... ON CONFLICT DO NOTHING (INSERT OR IGNORE в SQLite,
+    INSERT IGNORE в MySQL) по уникальному ограничению (user, target).
+    Параллельные запросы не создают дубликатов и не падают
+    с IntegrityError, а созданными считаются только действительно
+    вставленные строки: в PostgreSQL их возвращает RETURNING,
+    в остальных СУБД строки вставляются по одной и проверяется rowcount.
+    """
+
+    def __init__(self, target_field):
+        super().__init__()
+        self.target_field = target_field
+
+    def unique_ids(self, target_ids):
+        """id без повторов, приведенные к типу поля (из URL - строки)."""
+        target = self.model._meta.get_field(self.target_field)
+        return list(dict.fromkeys(
+            target.to_python(target_id) for target_id in target_ids
+        ))
+
+    def add(self, user, target_id):
+        """Создает связь, если ее еще нет. Возвращает True, если создана."""
+        return bool(self.add_many(user, [target_id]))
+
+    def add_many(self, user, target_ids):
+        """Создает недостающие связи, возвращает id, для которых создана.
+
+        Как и `create`, для каждой новой строки отправляет post_save,
+        но у экземпляров нет pk.
+        """
+        target = self.model._meta.get_field(self.target_field)
+        objs = [
+            self.model(user=user, **{target.attname: target_id})
+            for target_id in self.unique_ids(target_ids)
+        ]
+        if not objs:
+            return []
+        fields = [
+            field for field in self.model._meta.local_concrete_fields
+            if not field.primary_key
+        ]
+        connection = connections[self.db]
+        returning = connection.features.can_return_rows_from_bulk_insert
+        inserted = set()
+        with connection.cursor() as cursor:
+            for batch in [objs] if returning else [[obj] for obj in objs]:
+                query = InsertQuery(self.model, ignore_conflicts=True)
+                query.insert_values(fields, batch)
+                compiler = query.get_compiler(using=self.db)
+                if returning:
+                    compiler.returning_fields = [target]
+                for sql, params in compiler.as_sql():
+                    cursor.execute(sql, params)
+                    if returning:
+                        inserted.update(row[0] for row in cursor.fetchall())
+                    elif cursor.rowcount:
+                        inserted.add(getattr(batch[0], target.attname))
+        created = [
+            obj for obj in objs if getattr(obj, target.attname) in inserted
+        ]
+        for obj in created:
+            post_save.send(
+                sender=self.model, instance=obj, created=True,
+                update_fields=None, raw=False, using=self.db
+            )
+        return [getattr(obj, target.attname) for obj in created]
+
+    def remove(self, user, target_id):
+        """Удаляет связь, возвращает число удаленных строк."""
+        return self.filter(
+            user=user, **{self.target_field: target_id}
+        ).delete()[0]
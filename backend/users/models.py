@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from .managers import UserRelationManager
 from .validators import validate_username
 
 
@@ -56,6 +57,8 @@ class Subscribe(models.Model):
         verbose_name='подписан'
     )
 
+    objects = UserRelationManager('author')
+
     class Meta:
         verbose_name = 'Подписка на автора'
         verbose_name_plural = 'Подписки на авторов'
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Subscribe
+from .subscriptions import followed_authors_cache
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def invalidate_followed_authors(sender, instance, **kwargs):
+    followed_authors_cache.invalidate(instance.user_id)
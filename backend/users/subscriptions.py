@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+
+from .models import Subscribe
+
+
+class FollowedAuthorsCache:
+    """LRU-кэш id авторов, на которых подписан пользователь."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            author_ids = self._data.get(user_id)
+            if author_ids is not None:
+                self._data.move_to_end(user_id)
+            return author_ids
+
+    def set(self, user_id, author_ids):
+        with self._lock:
+            self._data[user_id] = author_ids
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+followed_authors_cache = FollowedAuthorsCache(
+    settings.SUBSCRIPTIONS_CACHE_SIZE
+)
+
+
+def get_followed_author_ids(user):
+    """Множество id авторов, на которых подписан пользователь."""
+    if followed_authors_cache.maxsize:
+        author_ids = followed_authors_cache.get(user.pk)
+        if author_ids is not None:
+            return author_ids
+    author_ids = frozenset(
+        Subscribe.objects.filter(user=user).values_list('author_id', flat=True)
+    )
+    if followed_authors_cache.maxsize:
+        followed_authors_cache.set(user.pk, author_ids)
+    return author_ids
+
+
+def prime_followed_author_ids(request):
+    """Подписки текущего пользователя, загруженные один раз за запрос.
+
+    Для анонимного пользователя - пустое множество.
+    """
+    author_ids = getattr(request, '_followed_author_ids', None)
+    if author_ids is None:
+        author_ids = (
+            get_followed_author_ids(request.user)
+            if request.user.is_authenticated else frozenset()
+        )
+        request._followed_author_ids = author_ids
+    return author_ids
+
+
+def is_subscribed(request, author):
+    """Подписан ли текущий пользователь на автора.
+
+    Подписки загружаются один раз за запрос и сохраняются в `request`.
+    """
+    if request is None or not request.user.is_authenticated:
+        return False
+    if request.user.pk == author.pk:
+        return False
+    return author.pk in prime_followed_author_ids(request)